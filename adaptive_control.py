@@ -0,0 +1,111 @@
+import logging
+import threading
+from collections import deque
+
+# Configurable parameters
+ADAPTIVE_MIN_REQUESTS_PER_SECOND = 0.2  # Lowest send rate the controller may set
+ADAPTIVE_MAX_REQUESTS_PER_SECOND = 5  # Highest send rate the controller may set
+ADAPTIVE_MIN_CONCURRENCY = 1  # Lowest number of requests in flight
+ADAPTIVE_MAX_CONCURRENCY = 4  # Highest number of requests in flight
+ADAPTIVE_WINDOW = 50  # Most recent requests considered by each decision
+ADAPTIVE_DECISION_INTERVAL = 20  # Requests between decisions
+ADAPTIVE_RATE_STEP = 0.5  # Requests/second added after a healthy window (additive increase)
+ADAPTIVE_DECREASE_FACTOR = 0.5  # Factor applied to rate and concurrency after an unhealthy window (multiplicative decrease)
+ADAPTIVE_MAX_THROTTLED_SHARE = 0.02  # Share of 429 responses above which the window is unhealthy
+ADAPTIVE_MAX_ERROR_SHARE = 0.05  # Share of other failures (5xx, timeouts, connection errors) above which the window is unhealthy
+ADAPTIVE_LATENCY_TARGET = 2.0  # 90th percentile latency (in seconds) above which the window is unhealthy
+
+def rate_text(requests_per_second):
+    """
+    Formats a send rate for the log (0 is uncapped).
+    """
+    return f"{requests_per_second:.2f} requests/second" if requests_per_second else "uncapped rate"
+
+class AdaptiveController:
+    """
+    AIMD controller for the submission loop. It limits the number of requests in flight and sets the
+    rate of `rate_limiter` (which must have set_rate). Every ADAPTIVE_DECISION_INTERVAL requests it looks
+    at the last ADAPTIVE_WINDOW outcomes: a healthy window raises the rate by ADAPTIVE_RATE_STEP and the
+    concurrency by one; too many 429s, too many errors or a slow 90th percentile multiplies both by
+    ADAPTIVE_DECREASE_FACTOR. Both always stay within the configured bounds, whose upper ends are raised to the
+    starting `requests_per_second` and `concurrency` when those are higher, so the controller never starts below
+    what was configured. A `requests_per_second` of 0 (no cap) leaves the rate uncapped and only the
+    concurrency is adjusted.
+    """
+    def __init__(self, rate_limiter, requests_per_second, concurrency,
+                 min_requests_per_second=ADAPTIVE_MIN_REQUESTS_PER_SECOND, max_requests_per_second=ADAPTIVE_MAX_REQUESTS_PER_SECOND,
+                 min_concurrency=ADAPTIVE_MIN_CONCURRENCY, max_concurrency=ADAPTIVE_MAX_CONCURRENCY):
+        self.rate_limiter = rate_limiter
+        self.min_requests_per_second = min_requests_per_second
+        self.max_requests_per_second = max(max_requests_per_second, requests_per_second or 0)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max(max_concurrency, concurrency)
+        self.requests_per_second = max(requests_per_second, min_requests_per_second) if requests_per_second else 0  # 0: uncapped
+        self.concurrency = max(concurrency, min_concurrency)
+        self.rate_limiter.set_rate(self.requests_per_second)
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.samples = deque(maxlen=ADAPTIVE_WINDOW)  # (latency, throttled, failed)
+        self.since_decision = 0
+        logging.info(f"Adaptive control started at {rate_text(self.requests_per_second)} and {self.concurrency} requests in flight")
+
+    def acquire(self):
+        """
+        Blocks until a request may be sent without exceeding the current concurrency.
+        """
+        with self.condition:
+            while self.in_flight >= self.concurrency:
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self):
+        """
+        Frees the slot taken by acquire once the response (or error) is received.
+        """
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify()
+
+    def record(self, latency, throttled=False, failed=False):
+        """
+        Adds the outcome of one request to the window and takes a decision when one is due.
+        """
+        with self.condition:
+            self.samples.append((latency, throttled, failed))
+            self.since_decision += 1
+            if self.since_decision >= ADAPTIVE_DECISION_INTERVAL:
+                self.decide()
+
+    def decide(self):
+        """
+        Raises or lowers rate and concurrency from the outcomes in the window. Called with the lock held.
+        """
+        self.since_decision = 0
+        total = len(self.samples)
+        throttled_share = sum(1 for _, throttled, _ in self.samples if throttled) / total
+        error_share = sum(1 for _, _, failed in self.samples if failed) / total
+        latencies = sorted(latency for latency, _, _ in self.samples)
+        latency_p90 = latencies[min(total - 1, int(total * 0.9))]
+        previous = (self.requests_per_second, self.concurrency)
+
+        if (throttled_share > ADAPTIVE_MAX_THROTTLED_SHARE or error_share > ADAPTIVE_MAX_ERROR_SHARE
+                or latency_p90 > ADAPTIVE_LATENCY_TARGET):
+            if self.requests_per_second:
+                self.requests_per_second = max(self.min_requests_per_second, self.requests_per_second * ADAPTIVE_DECREASE_FACTOR)
+            self.concurrency = max(self.min_concurrency, int(self.concurrency * ADAPTIVE_DECREASE_FACTOR))
+            self.samples.clear()  # Judge the new settings on fresh outcomes only
+            action = "decrease"
+        else:
+            if self.requests_per_second:
+                self.requests_per_second = min(self.max_requests_per_second, self.requests_per_second + ADAPTIVE_RATE_STEP)
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+            action = "increase"
+
+        if (self.requests_per_second, self.concurrency) != previous:
+            self.rate_limiter.set_rate(self.requests_per_second)
+            self.condition.notify_all()
+        logging.info(
+            f"Adaptive control {action}: {rate_text(previous[0])} -> {rate_text(self.requests_per_second)}, "
+            f"{previous[1]} -> {self.concurrency} in flight (429: {throttled_share:.1%}, errors: {error_share:.1%}, "
+            f"p90 latency: {latency_p90:.2f}s over {total} requests)"
+        )
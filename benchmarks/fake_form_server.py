@@ -0,0 +1,111 @@
+import argparse
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Configurable parameters
+DEFAULT_LATENCY = 0.05  # Mean response latency (in seconds)
+DEFAULT_LATENCY_JITTER = 0.02  # Maximum random deviation from the mean latency (in seconds)
+DEFAULT_ERROR_RATE = 0.0  # Share of requests answered with HTTP 500
+DEFAULT_BURST_INTERVAL = 0.0  # Seconds between 429 bursts (0 disables bursts)
+DEFAULT_BURST_DURATION = 1.0  # Duration of each 429 burst (in seconds)
+DEFAULT_RETRY_AFTER = 1  # Retry-After sent with 429 responses (in seconds)
+DEFAULT_BODY_SIZE = 20000  # Size of the confirmation page (in bytes), similar to Google Forms
+
+class FormServerConfig:
+    """
+    Behaviour of the fake form endpoint.
+    """
+    def __init__(self, latency=DEFAULT_LATENCY, latency_jitter=DEFAULT_LATENCY_JITTER, error_rate=DEFAULT_ERROR_RATE,
+                 burst_interval=DEFAULT_BURST_INTERVAL, burst_duration=DEFAULT_BURST_DURATION,
+                 retry_after=DEFAULT_RETRY_AFTER, body_size=DEFAULT_BODY_SIZE, seed=None):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.burst_interval = burst_interval
+        self.burst_duration = burst_duration
+        self.retry_after = retry_after
+        self.body = b"<html><body>Gracias por completar el formulario." + b" " * max(0, body_size - 56) + b"</body></html>"
+        self.random = random.Random(seed)
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.counts = {200: 0, 429: 0, 500: 0}
+
+    def in_burst(self):
+        """
+        Tells whether the server is currently inside a 429 burst.
+        """
+        if not self.burst_interval:
+            return False
+        return (time.monotonic() - self.started) % self.burst_interval < self.burst_duration
+
+def make_handler(config):
+    """
+    Builds a request handler that mimics the Google Forms /formResponse endpoint.
+    """
+    class FormResponseHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like the real endpoint
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with config.lock:
+                delay = max(0.0, config.latency + config.random.uniform(-config.latency_jitter, config.latency_jitter))
+                failed = config.random.random() < config.error_rate
+            time.sleep(delay)
+
+            if config.in_burst():
+                status, body, headers = 429, b"Too Many Requests", {"Retry-After": str(config.retry_after)}
+            elif failed:
+                status, body, headers = 500, b"Internal Server Error", {}
+            else:
+                status, body, headers = 200, config.body, {"Content-Type": "text/html; charset=utf-8"}
+            with config.lock:
+                config.counts[status] += 1
+
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Keep benchmark output clean
+
+    return FormResponseHandler
+
+def start_server(config=None, host="127.0.0.1", port=0):
+    """
+    Starts the fake form server in a background thread.
+    Returns a tuple (server, form_url); call server.shutdown() to stop it.
+    """
+    config = config or FormServerConfig()
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    server.config = config
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/formResponse"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the Google Forms /formResponse endpoint.")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY)
+    parser.add_argument("--latency-jitter", type=float, default=DEFAULT_LATENCY_JITTER)
+    parser.add_argument("--error-rate", type=float, default=DEFAULT_ERROR_RATE)
+    parser.add_argument("--burst-interval", type=float, default=DEFAULT_BURST_INTERVAL)
+    parser.add_argument("--burst-duration", type=float, default=DEFAULT_BURST_DURATION)
+    parser.add_argument("--retry-after", type=int, default=DEFAULT_RETRY_AFTER)
+    parser.add_argument("--body-size", type=int, default=DEFAULT_BODY_SIZE)
+    args = parser.parse_args()
+    server, url = start_server(
+        FormServerConfig(args.latency, args.latency_jitter, args.error_rate, args.burst_interval,
+                         args.burst_duration, args.retry_after, args.body_size),
+        port=args.port
+    )
+    print(f"Fake form endpoint listening on {url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,72 @@
+import argparse
+import random
+from datetime import datetime, timedelta
+from openpyxl import Workbook
+
+# Configurable parameters
+DEFAULT_ROWS = 1000
+DEFAULT_INVALID_SHARE = 0.1  # Share of rows with at least one validation error
+DEFAULT_SEED = 42
+INPUT_COLUMNS = ["Nombre", "Producto", "Monto", "Fecha de Solicitud"]
+
+NAMES = ["Ana", "Bruno", "Carla", "Diego", "Elena", "Fernando", "Gabriela", "Héctor", "Inés", "Joaquín", "Lucía", "Martín"]
+SURNAMES = ["Pérez", "González", "Muñoz", "Rojas", "Díaz", "Soto", "Contreras", "Silva", "Martínez", "Sepúlveda"]
+PRODUCTS = ["Crédito de consumo", "Tarjeta de crédito", "Cuenta corriente", "Crédito hipotecario", "Seguro"]
+
+def random_valid_row(rng):
+    """
+    Returns a row that passes every validation rule.
+    """
+    return [
+        f"{rng.choice(NAMES)} {rng.choice(SURNAMES)}",
+        rng.choice(PRODUCTS),
+        rng.randint(1, 50_000_000),
+        datetime(2025, 1, 1) + timedelta(days=rng.randint(0, 364)),
+    ]
+
+def make_invalid(row, rng):
+    """
+    Introduces one validation error in the row.
+    """
+    defect = rng.randrange(5)
+    if defect == 0:
+        row[rng.randrange(4)] = None  # Faltan datos
+    elif defect == 1:
+        row[0] = row[0] + " #" + str(rng.randint(1, 99))  # Caracteres especiales no permitidos
+    elif defect == 2:
+        row[0] = rng.randint(1, 1000)  # Ingrese Nombre válido
+    elif defect == 3:
+        row[2] = "mil pesos"  # Ingrese un monto válido
+    else:
+        row[3] = row[3].strftime("%d-%m-%Y")  # Fecha de Solicitud no está en formato fecha
+    return row
+
+def generate_input_file(path, rows=DEFAULT_ROWS, invalid_share=DEFAULT_INVALID_SHARE, seed=DEFAULT_SEED):
+    """
+    Writes a synthetic input file with `rows` data rows, `invalid_share` of them invalid.
+    The same seed always produces the same file contents.
+    Returns the number of invalid rows written.
+    """
+    rng = random.Random(seed)
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet()
+    worksheet.append(INPUT_COLUMNS)
+    invalid_rows = 0
+    for _ in range(rows):
+        row = random_valid_row(rng)
+        if rng.random() < invalid_share:
+            row = make_invalid(row, rng)
+            invalid_rows += 1
+        worksheet.append(row)
+    workbook.save(path)
+    return invalid_rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic input_file.xlsx for benchmarks.")
+    parser.add_argument("path", help="Output .xlsx path")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="Number of data rows (e.g. 1000 to 1000000)")
+    parser.add_argument("--invalid-share", type=float, default=DEFAULT_INVALID_SHARE, help="Share of invalid rows (0 to 1)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Random seed")
+    args = parser.parse_args()
+    invalid = generate_input_file(args.path, args.rows, args.invalid_share, args.seed)
+    print(f"Wrote {args.rows} rows ({invalid} invalid) to {args.path}")
@@ -0,0 +1,225 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+# Make the pipeline modules importable when the script is run directly
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPOSITORY_DIRECTORY not in sys.path:
+    sys.path.insert(0, REPOSITORY_DIRECTORY)
+
+try:
+    import resource  # Not available on Windows
+except ImportError:
+    resource = None
+
+import google_forms_submission
+import run_metrics
+from benchmarks.fake_form_server import FormServerConfig, start_server, DEFAULT_LATENCY, DEFAULT_ERROR_RATE, DEFAULT_BURST_INTERVAL
+from benchmarks.generate_input import generate_input_file, DEFAULT_ROWS, DEFAULT_INVALID_SHARE, DEFAULT_SEED
+from google_forms_submission import submit_to_google_forms
+from input_file_processment import validate_worktray
+from form_plan import load_form_plan
+from input_loader import clear_input_cache
+from worktray_creation import create_worktray
+import worktray_storage
+
+# Configurable parameters
+WORKTRAY_TEMPLATE_PATH = os.path.join(REPOSITORY_DIRECTORY, "input", "worktray_template.xlsx")
+FORM_SCHEMA_PATH = os.path.join(REPOSITORY_DIRECTORY, "input", "form_schema.json")
+BENCHMARK_LOG_FILE = "benchmark.log"  # Log of the pipeline modules, written inside the work directory
+DEFAULT_WORKERS = 8  # Submission workers used by the benchmark
+DEFAULT_REQUESTS_PER_SECOND = 0  # No rate cap, so the benchmark measures the pipeline and not the limiter
+
+def peak_rss_mb():
+    """
+    Returns the peak resident memory of the process in MB, or None where it cannot be read.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)  # Bytes on macOS, KB on Linux
+
+def time_stage(name, rows, function, trace_memory):
+    """
+    Runs one pipeline stage and returns its timing and memory record.
+    With `trace_memory`, the peak Python heap of the stage is measured with tracemalloc (which slows the stage down).
+    """
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        success = bool(function())
+    finally:
+        seconds = time.perf_counter() - started
+        peak_memory = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+    result = {
+        "stage": name,
+        "success": success,
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds, 1) if seconds else None,
+        "peak_memory_mb": round(peak_memory / (1024 * 1024), 1) if peak_memory is not None else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    print(
+        f"{name:<10} {'ok' if success else 'FAILED':<7} {seconds:9.2f}s {result['rows_per_second'] or 0:12.1f} rows/s"
+        + (f" {result['peak_memory_mb']:9.1f} MB peak" if peak_memory is not None else "")
+    )
+    return result
+
+def count_valid_rows(storage):
+    """
+    Returns the number of worktray rows whose "Datos correctos" is TRUE.
+    """
+    plan = load_form_plan()
+    return sum(values[plan.valid_index] is True for _, values in storage.read_rows())
+
+def check_validation(storage, rows, invalid_rows):
+    """
+    Checks that validation accepted exactly the rows the generator wrote as valid (the invalid ones include
+    blank cells, so a blank read as a value shows up here). Returns the check record.
+    """
+    valid_rows = count_valid_rows(storage)
+    check = {"expected_valid_rows": rows - invalid_rows, "valid_rows": valid_rows, "passed": valid_rows == rows - invalid_rows}
+    if not check["passed"]:
+        print(f"VALIDATION CHECK FAILED: {valid_rows} rows marked valid, expected {rows - invalid_rows}")
+    return check
+
+def run_benchmark(rows=DEFAULT_ROWS, invalid_share=DEFAULT_INVALID_SHARE, seed=DEFAULT_SEED, workers=DEFAULT_WORKERS,
+                  requests_per_second=DEFAULT_REQUESTS_PER_SECOND, server_config=None, backend=None, streaming=False,
+                  trace_memory=True, work_directory=None, fused=False, adaptive=False):
+    """
+    Generates a synthetic input file, then times create_worktray, validate_worktray and submit_to_google_forms
+    against the local fake form server. Everything runs inside `work_directory` (a new temporary directory by
+    default), so the real input and process_data folders are never touched.
+    With `fused`, the three stages share one in-memory worktray as in main.py's fused pipeline.
+    The submission runs with the given `workers` and `requests_per_second` unless `adaptive` lets the
+    adaptive controller change them.
+    After validation, the rows marked valid are checked against the rows the generator wrote as valid.
+    Returns a dict with the configuration, environment and one record per stage.
+    """
+    work_directory = work_directory or tempfile.mkdtemp(prefix="forms_benchmark_")
+    server_config = server_config or FormServerConfig(seed=seed)
+    for directory in ("input", "process_data", "_logs"):
+        os.makedirs(os.path.join(work_directory, directory), exist_ok=True)
+    shutil.copy(WORKTRAY_TEMPLATE_PATH, os.path.join(work_directory, "input", "worktray_template.xlsx"))
+    shutil.copy(FORM_SCHEMA_PATH, os.path.join(work_directory, "input", "form_schema.json"))
+
+    previous_directory = os.getcwd()
+    previous_form_url = google_forms_submission.GOOGLE_FORM_URL
+    server, form_url = start_server(server_config)
+    os.chdir(work_directory)
+    try:
+        logging.basicConfig(
+            filename=os.path.join("_logs", BENCHMARK_LOG_FILE),
+            level=logging.INFO,
+            format="%(asctime)s - %(levelname)s - %(message)s",
+            force=True
+        )
+        google_forms_submission.GOOGLE_FORM_URL = form_url
+        clear_input_cache()
+        run_metrics.reset_metrics()
+
+        print(f"Generating {rows} rows ({invalid_share:.0%} invalid) in {work_directory}")
+        started = time.perf_counter()
+        invalid_rows = generate_input_file(os.path.join("input", "input_file.xlsx"), rows, invalid_share, seed)
+        print(f"Input generated in {time.perf_counter() - started:.2f}s; submitting to {form_url}")
+
+        storage = worktray_storage.open_worktray_storage(backend, in_memory=True) if fused else None
+        try:
+            stages = [
+                time_stage("create", rows, lambda: not create_worktray(backend=backend, storage=storage).empty, trace_memory),
+                time_stage("validate", rows, lambda: validate_worktray(streaming=streaming, backend=backend, storage=storage), trace_memory),
+            ]
+            if storage is not None:
+                validation_check = check_validation(storage, rows, invalid_rows)
+            else:
+                checked_storage = worktray_storage.open_worktray_storage(backend)
+                try:
+                    validation_check = check_validation(checked_storage, rows, invalid_rows)
+                finally:
+                    checked_storage.close()
+            stages.append(time_stage("submit", rows, lambda: submit_to_google_forms(
+                workers=workers, requests_per_second=requests_per_second, streaming=streaming,
+                backend=backend, storage=storage, show_results=False,
+                skip_submitted=False,  # Post every row, also when a reused work directory holds a submission index
+                adaptive=adaptive
+            ), trace_memory))
+        finally:
+            if storage is not None:
+                storage.commit()
+                storage.close()
+    finally:
+        os.chdir(previous_directory)
+        google_forms_submission.GOOGLE_FORM_URL = previous_form_url
+        google_forms_submission.close_http_session()
+        server.shutdown()
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "config": {
+            "rows": rows,
+            "invalid_rows": invalid_rows,
+            "seed": seed,
+            "workers": workers,
+            "requests_per_second": requests_per_second,
+            "backend": backend or "default",
+            "streaming": streaming,
+            "fused": fused,
+            "adaptive": adaptive,
+            "trace_memory": trace_memory,
+            "server_latency": server_config.latency,
+            "server_error_rate": server_config.error_rate,
+            "server_burst_interval": server_config.burst_interval,
+        },
+        "server_responses": {str(status): count for status, count in server_config.counts.items()},
+        "stages": stages,
+        "validation_check": validation_check,
+        "request_latency_seconds": run_metrics.current_metrics.to_dict()["request_latency_seconds"],
+        "work_directory": work_directory,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time worktray creation, validation and submission on synthetic data.")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="Number of input rows (e.g. 1000 to 1000000)")
+    parser.add_argument("--invalid-share", type=float, default=DEFAULT_INVALID_SHARE, help="Share of invalid rows (0 to 1)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Random seed for the input file and the server")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Submission workers")
+    parser.add_argument("--rps", type=float, default=DEFAULT_REQUESTS_PER_SECOND, help="Requests per second cap (0 disables it)")
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY, help="Fake server latency (in seconds)")
+    parser.add_argument("--error-rate", type=float, default=DEFAULT_ERROR_RATE, help="Share of HTTP 500 responses")
+    parser.add_argument("--burst-interval", type=float, default=DEFAULT_BURST_INTERVAL, help="Seconds between 429 bursts (0 disables them)")
+    parser.add_argument("--backend", choices=["xlsx", "sqlite"], default=None, help="Worktray storage backend")
+    parser.add_argument("--streaming", action="store_true", help="Use the constant-memory streaming mode")
+    parser.add_argument("--adaptive", action="store_true", help="Let the adaptive controller change the workers and rate during the submission")
+    parser.add_argument("--fused", action="store_true", help="Share one in-memory worktray across the stages, as main.py does")
+    parser.add_argument("--no-trace-memory", action="store_true", help="Skip tracemalloc for undistorted timings")
+    parser.add_argument("--work-directory", default=None, help="Directory for the generated files (temporary by default)")
+    parser.add_argument("--output", default=None, help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run_benchmark(
+        rows=args.rows, invalid_share=args.invalid_share, seed=args.seed, workers=args.workers,
+        requests_per_second=args.rps,
+        server_config=FormServerConfig(latency=args.latency, error_rate=args.error_rate,
+                                       burst_interval=args.burst_interval, seed=args.seed),
+        backend=args.backend, streaming=args.streaming, trace_memory=not args.no_trace_memory,
+        work_directory=args.work_directory, fused=args.fused, adaptive=args.adaptive
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(results, output_file, indent=2)
+        print(f"Results written to: {args.output}")
+    else:
+        print(json.dumps(results, indent=2))
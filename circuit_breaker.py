@@ -0,0 +1,89 @@
+import logging
+import threading
+import time
+
+# Configurable parameters
+CIRCUIT_FAILURE_THRESHOLD = 5  # Consecutive connection errors or timeouts that open the circuit (0 disables the breaker)
+CIRCUIT_PROBE_INTERVAL = 30  # Seconds between probes while the circuit is open (each probe is a single request)
+CIRCUIT_MAX_OUTAGE = 900  # Seconds the circuit may stay open before the remaining rows are deferred and the run ends (0 ends it as soon as the circuit opens)
+
+# Observation of the rows that were not sent because the form endpoint was unreachable
+DEFERRED_MESSAGE = "Envío aplazado: el formulario no responde (se enviará en la próxima ejecución)"
+
+# Circuit states
+CIRCUIT_CLOSED = "closed"  # Requests are sent normally
+CIRCUIT_OPEN = "open"  # Requests wait; one probe is let through every CIRCUIT_PROBE_INTERVAL seconds
+CIRCUIT_GAVE_UP = "gave_up"  # The outage lasted longer than CIRCUIT_MAX_OUTAGE; no more requests are sent
+
+class CircuitBreaker:
+    """
+    Circuit breaker for the form endpoint, shared by all submission workers. After `failure_threshold`
+    consecutive connection errors or timeouts the circuit opens: workers stop sending and wait while a single
+    probe request is let through every `probe_interval` seconds. Any answer from the endpoint (whatever its
+    status) closes the circuit and the workers resume. If the circuit stays open for more than `max_outage`
+    seconds it gives up, and every row not sent yet is deferred without a request.
+    """
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, probe_interval=CIRCUIT_PROBE_INTERVAL, max_outage=CIRCUIT_MAX_OUTAGE):
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.max_outage = max_outage
+        self.condition = threading.Condition()
+        self.state = CIRCUIT_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.next_probe = None
+        self.outages = 0
+        self.outage_time = 0.0
+
+    def allow(self):
+        """
+        Tells whether a request may be sent now. While the circuit is open it blocks until the caller
+        may send the next probe or the circuit closes. Returns False once the breaker has given up.
+        """
+        with self.condition:
+            while True:
+                if self.state == CIRCUIT_CLOSED:
+                    return True
+                if self.state == CIRCUIT_GAVE_UP:
+                    return False
+                now = time.monotonic()
+                give_up_at = self.opened_at + self.max_outage
+                if now >= give_up_at:
+                    self.state = CIRCUIT_GAVE_UP
+                    self.outage_time += now - self.opened_at
+                    logging.error(f"Form endpoint still unreachable after {now - self.opened_at:.0f}s; the rows not sent yet are deferred.")
+                    self.condition.notify_all()
+                    return False
+                if now >= self.next_probe:
+                    self.next_probe = now + self.probe_interval
+                    logging.info("Circuit open: sending a probe request to the form endpoint")
+                    return True
+                self.condition.wait(min(self.next_probe, give_up_at) - now)
+
+    def record_success(self):
+        """
+        Records an answer from the endpoint, closing the circuit if it was open.
+        """
+        with self.condition:
+            self.consecutive_failures = 0
+            if self.state == CIRCUIT_OPEN:
+                outage = time.monotonic() - self.opened_at
+                self.outage_time += outage
+                self.state = CIRCUIT_CLOSED
+                logging.info(f"Form endpoint reachable again after {outage:.0f}s; circuit closed, resuming submissions.")
+                self.condition.notify_all()
+
+    def record_failure(self):
+        """
+        Records a connection error or timeout, opening the circuit after `failure_threshold` in a row.
+        Returns True if the circuit is not closed (the caller should wait in allow instead of spending its retries).
+        """
+        with self.condition:
+            self.consecutive_failures += 1
+            if self.state == CIRCUIT_CLOSED and self.consecutive_failures >= self.failure_threshold:
+                self.state = CIRCUIT_OPEN
+                self.outages += 1
+                self.opened_at = time.monotonic()
+                self.next_probe = self.opened_at + self.probe_interval
+                logging.error(f"Circuit opened after {self.consecutive_failures} consecutive connection errors or timeouts; probing the form endpoint every {self.probe_interval}s.")
+            return self.state != CIRCUIT_CLOSED
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import logging
+import os
+import re
+
+# Configurable parameters
+INPUT_DIRECTORY = "input"
+FORM_SCHEMA_FILE = "form_schema.json"  # Declarative description of the form: columns, rules and entry mappings
+COLUMN_TYPES = ("text", "number", "date", "any")  # Value types a column may require
+
+# Compiled plans, keyed by absolute path: {path: (mtime_ns, plan)}
+form_plan_cache = {}
+
+class ColumnRule:
+    """
+    Validation rule of one data column, with its regular expression already compiled.
+    """
+    def __init__(self, index, column):
+        self.name = column["name"]
+        self.index = index
+        self.type = column.get("type", "any")
+        if self.type not in COLUMN_TYPES:
+            raise ValueError(f"Column '{self.name}' has an unknown type: {self.type}")
+        self.required = column.get("required", True)
+        self.pattern = re.compile(column["pattern"]) if column.get("pattern") else None
+        self.date_formats = tuple(column.get("date_formats", ()))
+        self.type_message = column.get("type_message")
+        self.pattern_message = column.get("pattern_message")
+        self.blank_message = column.get("blank_message")
+        self.entry = column.get("entry")
+
+class FormPlan:
+    """
+    Form schema compiled for use on every row: column names and positions resolved, regular
+    expressions compiled and the form entry names paired with the column they are read from.
+    The worktray holds the data columns followed by the three status columns (valid, submitted, observations).
+    `validation_fingerprint` identifies the validation rules and messages (not the form URL or entries), so
+    results cached under one fingerprint are known to be stale once the schema changes.
+    """
+    def __init__(self, schema):
+        self.form_url = schema["form_url"]
+        self.rules = [ColumnRule(index, column) for index, column in enumerate(schema["columns"])]
+        self.data_columns = [rule.name for rule in self.rules]
+        self.data_count = len(self.rules)
+        status = schema["status_columns"]
+        self.status_columns = [status["valid"], status["submitted"], status["observations"]]
+        self.worktray_columns = self.data_columns + self.status_columns
+        self.column_count = len(self.worktray_columns)
+        self.valid_index = self.data_count  # e.g. "Datos correctos"
+        self.submitted_index = self.data_count + 1  # e.g. "Ingreso exitoso a Forms"
+        self.observations_index = self.data_count + 2  # e.g. "Observaciones"
+        self.incomplete_message = schema["incomplete_message"]
+        self.entries = tuple((rule.entry, rule.index) for rule in self.rules if rule.entry)
+        rules = [{key: value for key, value in column.items() if key != "entry"} for column in schema["columns"]]
+        self.validation_fingerprint = hashlib.sha256(
+            json.dumps([rules, self.incomplete_message], sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+        if len(set(self.worktray_columns)) != self.column_count:
+            raise ValueError("The form schema repeats a column name.")
+
+    def build_payload(self, values):
+        """
+        Builds the form payload from the data values of a row.
+        """
+        return {entry: values[index] for entry, index in self.entries}
+
+def load_form_plan(schema_path=None):
+    """
+    Reads the form schema (input/form_schema.json unless `schema_path` is given) and compiles it into a FormPlan.
+    The plan is cached, so the schema is only read and compiled again when it changes on disk.
+    """
+    schema_path = schema_path or os.path.join(INPUT_DIRECTORY, FORM_SCHEMA_FILE)
+    cache_key = os.path.abspath(schema_path)
+    mtime = os.stat(schema_path).st_mtime_ns
+    cached = form_plan_cache.get(cache_key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with open(schema_path, "r", encoding="utf-8") as schema_file:
+        plan = FormPlan(json.load(schema_file))
+    form_plan_cache[cache_key] = (mtime, plan)
+    logging.info(f"Form schema compiled from: {schema_path}")
+    return plan
@@ -1,18 +1,60 @@
+import argparse
 import logging
 import time
 import os
-from openpyxl import load_workbook
+import threading
+import random
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import requests
-import tkinter as tk
-from tkinter import messagebox
+from submission_journal import SubmissionJournal, journal_path_for, row_key
+from submission_index import SubmissionIndex
+from form_plan import load_form_plan
+from work_items import work_items
+from status_index import StatusIndex, status_index_path_for
+from input_file_processment import INCREMENTAL_VALIDATION, validate_in_background
+from response_classifier import (
+    classify_response, release_response, RESPONSE_ACCEPTED, RESPONSE_THROTTLED, RESPONSE_SERVER_ERROR,
+    RESPONSE_LOGIN_REQUIRED, RESPONSE_FORM_CLOSED, RESPONSE_OUTCOME_NAMES
+)
+from adaptive_control import AdaptiveController
+from circuit_breaker import CircuitBreaker, CIRCUIT_FAILURE_THRESHOLD, DEFERRED_MESSAGE
+from worktray_stream import StreamingWorktray
+import worktray_storage
+from headless import is_headless
+from queued_logging import configure_queued_logging
+from stage_profiling import PROFILE_ARGUMENT_HELP, set_profiling
+from run_metrics import (
+    timed_stage, add_stage_rows, observe_request, set_counter, export_metrics,
+    OUTCOME_SUCCESS, OUTCOME_HTTP_FAILURE, OUTCOME_TIMEOUT, OUTCOME_CONNECTION_ERROR
+)
 
 logging.info("---- Starting module 'google_forms_submission' ----")
 
 # Configurable parameters
 PROCESS_DATA_DIRECTORY = "process_data"
 WORKTRAY_FILE = "worktray.xlsx"
-GOOGLE_FORM_URL = "https://docs.google.com/forms/d/e/1FAIpQLSf_5o0pOYiDzAJp2uRdSfoj5xxIfzFs0M9beiaXTsdFgeAcrw/formResponse"  # Form submission URL
+GOOGLE_FORM_URL = None  # Form submission URL; None uses the form_url of input/form_schema.json
 SUBMISSION_DELAY = 1  # Delay between submissions (in seconds)
+SUBMISSION_WORKERS = 1  # Number of concurrent submission workers
+MAX_REQUESTS_PER_SECOND = 1 / SUBMISSION_DELAY  # Global cap on form submissions per second (0 disables the cap)
+REQUEST_TIMEOUT = 10  # Timeout for each form submission (in seconds)
+ADAPTIVE_CONTROL = True  # Let adaptive_control.py adjust rate and concurrency from the endpoint's responses (starting from the values above)
+HTTP_POOL_SIZE = 10  # Maximum number of keep-alive connections kept in the HTTP pool
+MAX_RETRIES = 3  # Retries per row after the first attempt for transient errors
+RETRY_BACKOFF_BASE = 1  # Base delay for exponential backoff (in seconds)
+RETRY_BACKOFF_MAX = 30  # Maximum delay between retries (in seconds)
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)  # Status codes considered transient
+CHECKPOINT_INTERVAL = 500  # Rows between periodic saves of the worktray (0 saves only at the end)
+RESUME_FROM_JOURNAL = True  # Replay the journal of an interrupted run instead of re-posting its rows
+STREAMING_MODE = False  # Stream the worktray row by row (constant memory) instead of loading it fully
+SUBMISSION_WINDOW = 1000  # Maximum rows held in memory while waiting for their submission result
+SKIP_PREVIOUSLY_SUBMITTED = True  # Mark rows accepted by the form in any previous run as duplicates instead of posting them again
+ROW_LOG_POLICY = "sampled"  # Row-level log lines: "all", "sampled" (every ROW_LOG_SAMPLE_EVERY rows plus errors), "errors" or "summary" (totals only)
+ROW_LOG_SAMPLE_EVERY = 1000  # With the "sampled" policy, rows between logged rows
+RESPONSE_LOG_LIMIT = 500  # Maximum characters of a response body written to the log
 LOGS_DIRECTORY = "_logs"  # Directory to store logs
 LOGS_FILE = os.path.join(LOGS_DIRECTORY, "google_forms_submission.log")  # Log file path
 
@@ -21,6 +63,15 @@ SUCCESS_MESSAGE = "Ingreso exitoso a Forms"
 FAILURE_MESSAGE = "Error en el ingreso a Forms"
 NETWORK_ERROR_MESSAGE = "Error de conexión (revise su conexión a internet o la URL del formulario)"
 BROWSER_ERROR_MESSAGE = "Error de navegador (no se pudo acceder al formulario)"
+DUPLICATE_MESSAGE = "Ingresado en una ejecución anterior"
+LOGIN_REQUIRED_MESSAGE = "El formulario requiere iniciar sesión"
+FORM_CLOSED_MESSAGE = "El formulario no acepta respuestas"
+
+# Observation of each response outcome that is a failure
+RESPONSE_FAILURE_MESSAGES = {
+    RESPONSE_LOGIN_REQUIRED: LOGIN_REQUIRED_MESSAGE,
+    RESPONSE_FORM_CLOSED: FORM_CLOSED_MESSAGE,
+}
 
 def configure_logging():
     """
@@ -29,19 +80,22 @@ def configure_logging():
     if not os.path.exists(LOGS_DIRECTORY):
         os.makedirs(LOGS_DIRECTORY)
     
-    # Clear any existing logging configuration
-    logging.basicConfig(
-        filename=LOGS_FILE,
-        level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(message)s",
-        force=True  # Force reconfiguration of logging
-    )
+    # Clear any existing logging configuration; records are written to the file by a background thread
+    configure_queued_logging(LOGS_FILE)
     logging.info("Logging configured successfully.")
 
 def show_results_popup(success_count, failure_count):
     """
     Shows a popup with the results of the execution.
+    In headless mode the results are printed to stdout instead.
     """
+    message = f"Resultados de la ejecución:\n\n- Filas cargadas exitosamente: {success_count}\n- Filas no cargadas: {failure_count}"
+    if is_headless():
+        print(message)
+        return
+
+    import tkinter as tk  # Imported only when the popup is actually shown
+
     root = tk.Tk()
     root.withdraw()  # Hide the root window
 
@@ -51,7 +105,6 @@ def show_results_popup(success_count, failure_count):
     popup.geometry("400x150")  # Set the size of the popup
 
     # Add a label with the message
-    message = f"Resultados de la ejecución:\n\n- Filas cargadas exitosamente: {success_count}\n- Filas no cargadas: {failure_count}"
     label = tk.Label(popup, text=message)
     label.pack(pady=10)
 
@@ -77,125 +130,509 @@ def show_results_popup(success_count, failure_count):
     # Wait for the user to interact with the popup
     popup.mainloop()
 
-def submit_to_google_forms():
+def row_log_enabled(row_number, level=logging.INFO):
+    """
+    Tells whether a row-level log line of `level` is written under ROW_LOG_POLICY.
+    Warnings and errors are written by every policy but "summary"; informational lines by "all"
+    and, for one row in every ROW_LOG_SAMPLE_EVERY, by "sampled".
+    """
+    if ROW_LOG_POLICY == "all":
+        return True
+    if ROW_LOG_POLICY == "summary":
+        return False
+    if level >= logging.WARNING:
+        return True
+    return ROW_LOG_POLICY == "sampled" and (row_number - 1) % ROW_LOG_SAMPLE_EVERY == 0
+
+def truncate_text(text, limit=RESPONSE_LOG_LIMIT):
+    """
+    Shortens a text (e.g. a response body) to `limit` characters for the log.
+    """
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text) - limit} more characters]"
+
+class RateLimiter:
+    """
+    Thread-safe limiter that spaces out calls so that no more than
+    `requests_per_second` start per second across all workers.
+    """
+    def __init__(self, requests_per_second):
+        self.interval = 1 / requests_per_second if requests_per_second and requests_per_second > 0 else 0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def set_rate(self, requests_per_second):
+        """
+        Changes the rate for the next requests (0 disables the cap).
+        """
+        with self.lock:
+            self.interval = 1 / requests_per_second if requests_per_second and requests_per_second > 0 else 0
+
+    def wait(self):
+        """
+        Blocks until the caller is allowed to send the next request.
+        """
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+# Shared HTTP session (created on first use)
+http_session = None
+http_session_lock = threading.Lock()
+
+def get_http_session(pool_size=HTTP_POOL_SIZE):
+    """
+    Returns the shared HTTP session, creating it on first use.
+    The session keeps connections alive so rows reuse the same TCP/TLS connection.
+    """
+    global http_session
+    with http_session_lock:
+        if http_session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({"Content-Type": "application/x-www-form-urlencoded"})
+            http_session = session
+            logging.info(f"HTTP session created with a pool of {pool_size} connections")
+        return http_session
+
+def close_http_session():
+    """
+    Closes the shared HTTP session and its pooled connections.
+    """
+    global http_session
+    with http_session_lock:
+        if http_session is not None:
+            http_session.close()
+            http_session = None
+
+def parse_retry_after(value):
+    """
+    Parses a Retry-After header (seconds or HTTP date).
+    Returns the delay in seconds, or None if the header is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def compute_backoff(attempt, retry_after=None):
+    """
+    Returns the delay before the next attempt: the server's Retry-After when given,
+    otherwise exponential backoff with full jitter. Always capped at RETRY_BACKOFF_MAX.
+    """
+    if retry_after is not None:
+        return min(retry_after, RETRY_BACKOFF_MAX)
+    return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * (2 ** (attempt - 1))))
+
+def submit_row(row_number, form_data, rate_limiter=None, controller=None, form_url=None, breaker=None):
+    """
+    Submits a single row to Google Forms (GOOGLE_FORM_URL if set, otherwise `form_url` or the form_url
+    of the form schema), retrying transient errors with backoff.
+    With an adaptive `controller`, each request waits for a free in-flight slot and reports its outcome.
+    With a circuit `breaker`, each request first waits while the circuit is open, and connection errors or
+    timeouts during an outage do not use up the retries of the row. A row that cannot be sent because the
+    breaker gave up returns the observation DEFERRED_MESSAGE.
+    Returns a tuple (success, observation, attempts, backoff_time) where attempts is the
+    number of requests sent and backoff_time the total seconds spent waiting between them.
+    """
+    form_url = GOOGLE_FORM_URL or form_url or load_form_plan().form_url
+
+    def observe(outcome, seconds, status_code=None):
+        observe_request(outcome, seconds)
+        if controller is not None:
+            controller.record(
+                seconds,
+                throttled=status_code == 429,
+                failed=outcome in (OUTCOME_TIMEOUT, OUTCOME_CONNECTION_ERROR) or (status_code or 0) >= 500
+            )
+
+    session = get_http_session()
+    attempts = 0
+    outage_attempts = 0  # Requests that failed while the circuit was open (not counted against MAX_RETRIES)
+    backoff_time = 0.0
+    while True:
+        if breaker is not None and not breaker.allow():
+            if row_log_enabled(row_number, logging.WARNING):
+                logging.warning(f"Row {row_number} deferred: the form endpoint is unreachable. Attempts: {attempts}")
+            return False, DEFERRED_MESSAGE, attempts, backoff_time
+        attempts += 1
+        retry_after = None
+        try:
+            if controller is not None:
+                controller.acquire()
+            try:
+                if rate_limiter is not None:
+                    rate_limiter.wait()
+
+                if row_log_enabled(row_number):
+                    logging.info(f"Submitting row {row_number} to Google Forms (attempt {attempts}): {form_data}")
+
+                # Submit data to Google Forms; the body is only read if the status does not decide
+                request_started = time.perf_counter()
+                response = session.post(
+                    form_url,
+                    data=form_data,
+                    timeout=REQUEST_TIMEOUT,  # Set a timeout for the request
+                    stream=True
+                )
+                try:
+                    outcome, detail = classify_response(response, RETRY_STATUS_CODES)
+                finally:
+                    release_response(response)
+            finally:
+                if controller is not None:
+                    controller.release()
+            request_seconds = time.perf_counter() - request_started
+            if breaker is not None:
+                breaker.record_success()  # The endpoint answered, whatever the status
+
+            # Check if the submission was successful
+            if outcome == RESPONSE_ACCEPTED:
+                observe(OUTCOME_SUCCESS, request_seconds, response.status_code)
+                if row_log_enabled(row_number):
+                    logging.info(f"Row {row_number} submitted successfully. Response: {response.status_code}, attempts: {attempts}, backoff: {backoff_time:.2f}s")
+                return True, SUCCESS_MESSAGE, attempts, backoff_time
+            observe(OUTCOME_HTTP_FAILURE, request_seconds, response.status_code)
+            if outcome not in (RESPONSE_THROTTLED, RESPONSE_SERVER_ERROR) or attempts - outage_attempts > MAX_RETRIES:
+                if row_log_enabled(row_number, logging.ERROR):
+                    logging.error(f"Error submitting row {row_number}. Status code: {response.status_code}, outcome: {RESPONSE_OUTCOME_NAMES[outcome]}, attempts: {attempts}, backoff: {backoff_time:.2f}s, Response: {truncate_text(detail)}")
+                return False, RESPONSE_FAILURE_MESSAGES.get(outcome, FAILURE_MESSAGE), attempts, backoff_time
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if row_log_enabled(row_number, logging.WARNING):
+                logging.warning(f"Transient status {response.status_code} submitting row {row_number}.")
+
+        except requests.exceptions.Timeout:
+            # Handle timeout errors (e.g., no internet connection)
+            observe(OUTCOME_TIMEOUT, time.perf_counter() - request_started)
+            if breaker is not None and breaker.record_failure():
+                outage_attempts += 1
+                continue  # Wait for the circuit in allow()
+            if attempts - outage_attempts > MAX_RETRIES:
+                if row_log_enabled(row_number, logging.ERROR):
+                    logging.error(f"Timeout error submitting row {row_number}: No internet connection or server took too long to respond. Attempts: {attempts}, backoff: {backoff_time:.2f}s")
+                return False, NETWORK_ERROR_MESSAGE, attempts, backoff_time
+            if row_log_enabled(row_number, logging.WARNING):
+                logging.warning(f"Timeout submitting row {row_number}.")
+
+        except requests.exceptions.ConnectionError:
+            # Handle connection errors (e.g., invalid URL or no internet)
+            observe(OUTCOME_CONNECTION_ERROR, time.perf_counter() - request_started)
+            if breaker is not None and breaker.record_failure():
+                outage_attempts += 1
+                continue  # Wait for the circuit in allow()
+            if attempts - outage_attempts > MAX_RETRIES:
+                if row_log_enabled(row_number, logging.ERROR):
+                    logging.error(f"Connection error submitting row {row_number}: Invalid URL or no internet connection. Attempts: {attempts}, backoff: {backoff_time:.2f}s")
+                return False, NETWORK_ERROR_MESSAGE, attempts, backoff_time
+            if row_log_enabled(row_number, logging.WARNING):
+                logging.warning(f"Connection error submitting row {row_number}.")
+
+        except requests.exceptions.RequestException as e:
+            # Handle other request-related errors (e.g., browser errors)
+            observe(OUTCOME_CONNECTION_ERROR, time.perf_counter() - request_started)
+            if row_log_enabled(row_number, logging.ERROR):
+                logging.error(f"Browser error submitting row {row_number}: {str(e)}", exc_info=True)
+            return False, BROWSER_ERROR_MESSAGE, attempts, backoff_time
+
+        except Exception as e:
+            # Handle any other unexpected errors
+            logging.error(f"Unexpected error submitting row {row_number}: {str(e)}", exc_info=True)
+            return False, FAILURE_MESSAGE, attempts, backoff_time
+
+        # Wait before retrying the transient error
+        delay = compute_backoff(attempts, retry_after)
+        if row_log_enabled(row_number):
+            logging.info(f"Retrying row {row_number} in {delay:.2f}s (attempt {attempts + 1} of {MAX_RETRIES + 1})")
+        time.sleep(delay)
+        backoff_time += delay
+
+def submit_and_record(journal, worktray_row, data, plan, rate_limiter, controller=None, breaker=None):
+    """
+    Submits the `data` values of a row and records its outcome, requests sent and backoff time in the journal
+    as soon as it completes. Deferred rows were not sent, so they are left out of the journal and posted again by the next run.
+    """
+    result = submit_row(worktray_row - 1, plan.build_payload(data), rate_limiter, controller, plan.form_url, breaker)
+    if result[1] != DEFERRED_MESSAGE:
+        journal.append(worktray_row, data, *result)
+    return result
+
+def apply_journal_entry(item, entry):
+    """
+    Applies an outcome recorded by an interrupted run to a work item.
+    Returns False (and leaves the item untouched) if the row data no longer matches the entry.
+    """
+    if row_key(item.data) != entry["key"]:
+        if row_log_enabled(item.row - 1, logging.WARNING):
+            logging.warning(f"Ignoring journal entry for row {item.row - 1}: data does not match the worktray")
+        return False
+    item.submitted = entry["success"]  # Ingreso exitoso a Forms
+    item.set_observation(entry["observation"])  # Observaciones
+    item.attempts = entry.get("attempts")  # Entries of older journals have no attempts or backoff time
+    item.backoff_time = entry.get("backoff_time")
+    return True
+
+def submit_rows(items, journal, rate_limiter, workers, counters, window=SUBMISSION_WINDOW, index=None, controller=None, plan=None, breaker=None):
+    """
+    Submits the eligible rows of `items`, an iterable of work items. Rows whose "Datos correctos" is not TRUE
+    or whose "Ingreso exitoso a Forms" is already TRUE are skipped. Yields every (item, updated) in the original order once
+    its "Ingreso exitoso a Forms" and "Observaciones" values are final; `updated` tells whether they were
+    set in this run. At most `window` rows are held in memory. Success/failure counts, requests sent and backoff time are accumulated in `counters`.
+    With a submission `index`, rows it held before this run are marked as duplicates without being posted, and
+    the rows accepted by the form are added to it (repeats within this run are posted again). An adaptive `controller` limits the requests in flight
+    among the `workers` threads. Columns and payload come from the form `plan` (the form schema by default).
+    With a circuit `breaker`, rows that could not be sent during an outage keep "Ingreso exitoso a Forms" as
+    PENDING with the observation DEFERRED_MESSAGE; they are counted as failures and also in counters["deferred"].
+    """
+    plan = plan or load_form_plan()
+    in_flight = deque()
+
+    def finish(item, future, updated):
+        if future is not None:
+            success, observation, attempts, backoff_time = future.result()
+            counters["attempts"] += attempts
+            counters["backoff_time"] += backoff_time
+            item.attempts = attempts
+            item.backoff_time = backoff_time
+            item.submitted = "PENDING" if observation == DEFERRED_MESSAGE else success  # Ingreso exitoso a Forms
+            item.set_observation(observation)  # Observaciones
+            counters["success" if success else "failure"] += 1
+            if observation == DEFERRED_MESSAGE:
+                counters["deferred"] += 1
+            if success and index is not None:
+                index.add(item.data)
+        add_stage_rows("submit", 1)
+        return item, updated
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for item in items:
+            row_number = item.row - 1  # Adjust for zero-based index
+            log_row = row_log_enabled(row_number)
+            if log_row:
+                logging.info(f"Processing row {row_number}: {item.values()}")
+            future = None
+            updated = False
+
+            if item.valid != True:
+                # Skip rows where "Datos correctos" is FALSE
+                if log_row:
+                    logging.info(f"Skipping row {row_number}: 'Datos correctos' is FALSE")
+                counters["failure"] += 1
+            elif item.submitted == True:
+                # Skip rows where "Ingreso exitoso a Forms" is already TRUE
+                if log_row:
+                    logging.info(f"Skipping row {row_number}: 'Ingreso exitoso a Forms' is already TRUE")
+                counters["success"] += 1
+                if index is not None:
+                    index.add(item.data)  # e.g. replayed from the journal of an interrupted run
+            elif index is not None and index.contains(item.data):
+                # Skip rows accepted by the form in a previous run
+                if log_row:
+                    logging.info(f"Skipping row {row_number}: already submitted in a previous run")
+                item.submitted = True  # Ingreso exitoso a Forms
+                item.set_observation(DUPLICATE_MESSAGE)  # Observaciones
+                counters["success"] += 1
+                counters["duplicate"] += 1
+                updated = True
+            else:
+                future = executor.submit(submit_and_record, journal, item.row, item.data, plan, rate_limiter, controller, breaker)
+
+            in_flight.append((item, future, updated or future is not None))
+            while len(in_flight) > window:
+                yield finish(*in_flight.popleft())
+
+        while in_flight:
+            yield finish(*in_flight.popleft())
+
+def clear_submission_journal(worktray_path=None):
+    """
+    Removes the submission journal once the worktray holding its outcomes has been saved.
+    """
+    worktray_path = worktray_path or os.path.join(PROCESS_DATA_DIRECTORY, WORKTRAY_FILE)
+    SubmissionJournal(journal_path_for(worktray_path)).clear()
+
+@timed_stage("submit")
+def submit_to_google_forms(workers=SUBMISSION_WORKERS, requests_per_second=MAX_REQUESTS_PER_SECOND, pool_size=HTTP_POOL_SIZE,
+                           resume=RESUME_FROM_JOURNAL, checkpoint_interval=CHECKPOINT_INTERVAL, streaming=STREAMING_MODE,
+                           backend=None, storage=None, show_results=True, skip_submitted=SKIP_PREVIOUSLY_SUBMITTED,
+                           adaptive=ADAPTIVE_CONTROL, plan=None, validate=False, circuit_breaker=CIRCUIT_FAILURE_THRESHOLD > 0):
     """
     Submits data from the worktray to Google Forms.
     Updates "Ingreso exitoso a Forms" and "Observaciones" based on the submission result.
     Skips rows where "Ingreso exitoso a Forms" is already TRUE.
     Handles network errors, browser errors, and other exceptions.
     Only processes rows where "Datos correctos" is TRUE.
+    Rows are submitted by `workers` concurrent threads, globally capped at
+    `requests_per_second` submissions per second, over a shared keep-alive pool of `pool_size` connections.
+    Each outcome is appended to a journal next to the worktray as soon as it is known. The worktray is
+    saved every `checkpoint_interval` rows and at the end, after which the journal is removed.
+    With `resume`, the journal left by an interrupted run is replayed so its rows are not posted again.
+    The worktray is read and updated through the worktray storage (`backend`, worktray_storage.WORKTRAY_BACKEND
+    by default). With `streaming` and the xlsx backend, the worktray is read and rewritten row by row so memory
+    use stays flat; the journal is then the only checkpoint until the new worktray is swapped in at the end.
+    When an open `storage` is given (fused pipeline), it is updated in place; persisting it and then calling
+    clear_submission_journal is left to the caller. The journal then lives next to the storage file.
+    With `skip_submitted`, rows whose data was accepted by the form in any previous run (according to the
+    submission index, process_data/submission_index.sqlite) are marked as duplicates instead of being posted.
+    With `adaptive`, `workers` and `requests_per_second` are only the starting point: the adaptive controller
+    raises or lowers both from the latency, errors and 429s of the endpoint, within the bounds of adaptive_control.py
+    (raised to the starting values when those are higher; a `requests_per_second` of 0 keeps the rate uncapped).
+    Columns, payload and form URL come from the form `plan` (the compiled input/form_schema.json by default).
+    With `validate`, the rows are validated on the way (overlapped pipeline): a background thread validates them
+    and hands them over through a bounded queue, so the first rows are posted while the rest are still being
+    validated. "Datos correctos" is then written together with the submission results.
+    With `circuit_breaker`, an unreachable endpoint (CIRCUIT_FAILURE_THRESHOLD connection errors or timeouts in
+    a row) pauses the submissions while single probes check whether it is back (circuit_breaker.py). If the
+    outage outlasts CIRCUIT_MAX_OUTAGE, the remaining rows are deferred without being posted and the run ends;
+    they stay PENDING, so the next run (or retry_failures.py) submits them.
+    The results popup is shown unless `show_results` is False.
     """
+    index = None
     try:
         # Path to the worktray file
         worktray_path = os.path.join(PROCESS_DATA_DIRECTORY, WORKTRAY_FILE)
-        
-        # Read the worktray
-        logging.info(f"Reading the worktray from: {worktray_path}")
-        worktray_wb = load_workbook(worktray_path)
-        worktray_ws = worktray_wb.active
-        
-        # Log the number of rows to process
-        total_rows = worktray_ws.max_row - 1  # Subtract header row
-        logging.info(f"Total rows to process: {total_rows}")
+        backend = backend or worktray_storage.WORKTRAY_BACKEND
+        plan = plan or load_form_plan()
+
+        # Outcomes of an interrupted run
+        journal = SubmissionJournal(journal_path_for(storage.path if storage is not None else worktray_path))
+        journal_entries = journal.load() if resume else {}
+        if not resume:
+            journal.clear()
+        if journal_entries:
+            logging.info(f"Replaying {len(journal_entries)} rows from the journal: {journal.path}")
 
         # Counters for successful and failed submissions
-        success_count = 0
-        failure_count = 0
-        
-        # Iterate through rows (skip the header row)
-        for row in worktray_ws.iter_rows(min_row=2, max_row=worktray_ws.max_row, min_col=1, max_col=9):
-            row_number = row[0].row - 1  # Adjust for zero-based index
-            logging.info(f"Processing row {row_number}: {[cell.value for cell in row]}")
-            
-            # Skip rows where "Datos correctos" is FALSE
-            if row[4].value != True:
-                logging.info(f"Skipping row {row_number}: 'Datos correctos' is FALSE")
-                failure_count += 1
-                continue
-            
-            # Skip rows where "Ingreso exitoso a Forms" is already TRUE
-            if row[5].value == True:
-                logging.info(f"Skipping row {row_number}: 'Ingreso exitoso a Forms' is already TRUE")
-                success_count += 1
-                continue
-            
+        counters = {"success": 0, "failure": 0, "duplicate": 0, "deferred": 0, "attempts": 0, "backoff_time": 0.0}
+
+        # Rows accepted by the form in previous runs
+        if skip_submitted:
+            index = SubmissionIndex()
+
+        logging.info(f"Submitting rows with {workers} workers (max {requests_per_second} requests/second)")
+        rate_limiter = RateLimiter(requests_per_second)
+        controller = None
+        if adaptive:
+            controller = AdaptiveController(rate_limiter, requests_per_second, workers)
+            workers = controller.max_concurrency  # Threads available to the controller
+        get_http_session(max(pool_size, workers))
+        breaker = CircuitBreaker() if circuit_breaker else None
+
+        owns_storage = storage is None
+        streaming = streaming and backend == "xlsx" and owns_storage
+
+        def journal_items(rows):
+            # The validation cache grows with the new rows, so streaming runs validate without it
+            items = validate_in_background(rows, plan, incremental=INCREMENTAL_VALIDATION and not streaming) if validate else work_items(rows, plan)
+            for item in items:
+                if item.row in journal_entries:
+                    apply_journal_entry(item, journal_entries[item.row])
+                yield item
+
+        if streaming:
+            # Read the worktray row by row
+            logging.info(f"Streaming the worktray from: {worktray_path}")
+            worktray = StreamingWorktray(worktray_path, plan=plan)
+            status_index = StatusIndex(status_index_path_for(worktray_path))
+            logging.info(f"Total rows to process: {worktray.total_rows()}")
             try:
-                # Prepare data for Google Forms submission
-                form_data = {
-                    "entry.274949855": row[0].value,  # Nombre
-                    "entry.1623880646": row[1].value,  # Producto
-                    "entry.1721353382": row[2].value,  # Monto
-                    "entry.1896335859": row[3].value,  # Fecha de Solicitud
-                }
-                
-                logging.info(f"Submitting row {row_number} to Google Forms: {form_data}")
-                
-                # Submit data to Google Forms
-                response = requests.post(
-                    GOOGLE_FORM_URL,
-                    data=form_data,
-                    headers={"Content-Type": "application/x-www-form-urlencoded"},
-                    timeout=10  # Set a timeout for the request
-                )
-                
-                # Check if the submission was successful
-                if response.status_code == 200 or "Gracias" in response.text:  # Google Forms may return a 200 or a redirect
-                    row[5].value = True  # Ingreso exitoso a Forms
-                    row[6].value = SUCCESS_MESSAGE  # Observaciones
-                    logging.info(f"Row {row_number} submitted successfully. Response: {response.status_code}")
-                    success_count += 1
-                else:
-                    row[5].value = False  # Ingreso exitoso a Forms
-                    row[6].value = FAILURE_MESSAGE  # Observaciones
-                    logging.error(f"Error submitting row {row_number}. Status code: {response.status_code}, Response text: {response.text}")
-                    failure_count += 1
-            
-            except requests.exceptions.Timeout:
-                # Handle timeout errors (e.g., no internet connection)
-                row[5].value = False  # Ingreso exitoso a Forms
-                row[6].value = NETWORK_ERROR_MESSAGE  # Observaciones
-                logging.error(f"Timeout error submitting row {row_number}: No internet connection or server took too long to respond.")
-                failure_count += 1
-            
-            except requests.exceptions.ConnectionError:
-                # Handle connection errors (e.g., invalid URL or no internet)
-                row[5].value = False  # Ingreso exitoso a Forms
-                row[6].value = NETWORK_ERROR_MESSAGE  # Observaciones
-                logging.error(f"Connection error submitting row {row_number}: Invalid URL or no internet connection.")
-                failure_count += 1
-            
-            except requests.exceptions.RequestException as e:
-                # Handle other request-related errors (e.g., browser errors)
-                row[5].value = False  # Ingreso exitoso a Forms
-                row[6].value = BROWSER_ERROR_MESSAGE  # Observaciones
-                logging.error(f"Browser error submitting row {row_number}: {str(e)}", exc_info=True)
-                failure_count += 1
-            
-            except Exception as e:
-                # Handle any other unexpected errors
-                row[5].value = False  # Ingreso exitoso a Forms
-                row[6].value = FAILURE_MESSAGE  # Observaciones
-                logging.error(f"Unexpected error submitting row {row_number}: {str(e)}", exc_info=True)
-                failure_count += 1
-            
-            # Add delay between submissions
-            time.sleep(SUBMISSION_DELAY)
-        
-        # Save the updated worktray
-        worktray_wb.save(worktray_path)
-        logging.info(f"Worktray updated and saved to: {worktray_path}")
+                for item, updated in submit_rows(journal_items(worktray.rows()), journal, rate_limiter, workers, counters, index=index, controller=controller, plan=plan, breaker=breaker):
+                    worktray.append(item.values())
+                    if validate or updated or item.row in journal_entries:
+                        status_index.record_item(item)
+                worktray.commit()
+            except Exception:
+                worktray.close()
+                raise
+            finally:
+                status_index.close()
+        else:
+            if owns_storage:
+                storage = worktray_storage.open_worktray_storage(backend, plan=plan)
+            status_index = StatusIndex(status_index_path_for(storage.path))
+            try:
+                # Log the number of rows to process
+                total_rows = storage.total_rows()
+                logging.info(f"Total rows to process: {total_rows}")
+
+                # Write the results back to the worktray in order
+                result_columns = (plan.submitted_index, plan.observations_index)  # Ingreso exitoso a Forms, Observaciones
+                if validate:
+                    result_columns = (plan.valid_index,) + result_columns  # Datos correctos too
+                for processed, (item, updated) in enumerate(
+                    submit_rows(journal_items(storage.read_rows()), journal, rate_limiter, workers, counters, index=index, controller=controller, plan=plan, breaker=breaker), start=1
+                ):
+                    if validate or updated or item.row in journal_entries:
+                        storage.update_row(item.row, item.values(), result_columns)
+                        status_index.record_item(item)
+
+                    # Periodically fold the journal into the worktray
+                    if checkpoint_interval and processed % checkpoint_interval == 0:
+                        storage.commit()
+                        status_index.commit()
+                        logging.info(f"Checkpoint: {processed} of {total_rows} rows saved to: {storage.path}")
+
+                # Save the updated worktray
+                worktray_path = storage.path
+                if owns_storage:
+                    storage.commit()
+            finally:
+                status_index.close()
+                if owns_storage:
+                    storage.close()
+
+        logging.info(f"Rows submitted: {counters['success']}, rows not submitted: {counters['failure']}")
+        set_counter("rows_submitted", counters["success"])
+        set_counter("rows_not_submitted", counters["failure"])
+        logging.info(f"Requests sent: {counters['attempts']}, total backoff time: {counters['backoff_time']:.2f}s")
+        if breaker is not None:
+            logging.info(f"Rows deferred because the form endpoint was unreachable: {counters['deferred']}, outages: {breaker.outages}, time with the circuit open: {breaker.outage_time:.0f}s")
+            set_counter("rows_deferred", counters["deferred"])
+            set_counter("endpoint_outages", breaker.outages)
+        if index is not None:
+            logging.info(f"Rows skipped as already submitted in a previous run: {counters['duplicate']}")
+            set_counter("rows_duplicate", counters["duplicate"])
+        if owns_storage:
+            journal.clear()
+            logging.info(f"Worktray updated and saved to: {worktray_path}")
+        else:
+            journal.close()
+            logging.info(f"Worktray updated in memory for: {worktray_path}")
 
         # Show the results popup
-        show_results_popup(success_count, failure_count)
+        if show_results:
+            show_results_popup(counters["success"], counters["failure"])
         
         return True
     
     except Exception as e:
         logging.error(f"Error during Google Forms submission: {str(e)}", exc_info=True)
         return False
+    finally:
+        if index is not None:
+            index.close()
 
 # Execute the function if the script is run directly
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Submit the valid rows of the worktray to Google Forms.")
+    parser.add_argument("--profile", action="store_true", help=PROFILE_ARGUMENT_HELP)
+    if parser.parse_args().profile:
+        set_profiling()
+
     # Configure logging
     if not os.path.exists("_logs"):
         os.makedirs("_logs")
@@ -203,6 +640,7 @@ if __name__ == "__main__":
     logging.info("---- Starting module 'google_forms_submission' ----")
     # Submit data to Google Forms
     success = submit_to_google_forms()
+    export_metrics()
     
     if not success:
         logging.error("Google Forms submission failed. Check the logs for details.")
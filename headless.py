@@ -0,0 +1,20 @@
+import os
+
+# Configurable parameters
+HEADLESS_ENVIRONMENT_VARIABLE = "FORMS_AUTOMATION_HEADLESS"  # Set to 1, true or yes to run without dialogs
+HEADLESS_MODE = os.environ.get(HEADLESS_ENVIRONMENT_VARIABLE, "").strip().lower() in ("1", "true", "yes")
+
+def is_headless():
+    """
+    Tells whether the process runs unattended: no dialogs are shown, confirmations are
+    accepted automatically and their messages are printed to stdout instead.
+    """
+    return HEADLESS_MODE
+
+def set_headless(enabled=True):
+    """
+    Enables or disables headless mode for this process and the worker processes it starts.
+    """
+    global HEADLESS_MODE
+    HEADLESS_MODE = enabled
+    os.environ[HEADLESS_ENVIRONMENT_VARIABLE] = "1" if enabled else "0"
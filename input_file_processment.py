@@ -1,22 +1,37 @@
+import argparse
 import logging
 import os
-from openpyxl import load_workbook
+import queue
+import threading
+import time
 from datetime import datetime
-import re  # Regular expressions for special character validation
+from itertools import islice
+import numpy as np
+import pandas as pd
+from worktray_stream import StreamingWorktray
+import worktray_storage
+from run_metrics import timed_stage, add_stage_rows, add_stage_time, export_metrics
+from queued_logging import configure_queued_logging
+from stage_profiling import PROFILE_ARGUMENT_HELP, set_profiling
+from form_plan import load_form_plan
+from work_items import observation_codes, work_items
+from status_index import StatusIndex, status_index_path_for
+from validation_cache import ValidationCache, validation_key
 
 # Configurable parameters
 LOGS_DIRECTORY = "_logs"  # Directory to store logs
 LOGS_FILE = os.path.join(LOGS_DIRECTORY, "input_file_processment.log")  # Log file path
 PROCESS_DATA_DIRECTORY = "process_data"
 WORKTRAY_FILE = "worktray.xlsx"
+STREAMING_MODE = False  # Stream the worktray row by row (constant memory) instead of loading it fully
+VALIDATION_CHUNK_SIZE = 10000  # Rows validated at once
+PIPELINE_CHUNK_SIZE = 1000  # Rows validated at once when validation feeds the submission directly (first rows are sent sooner)
+PIPELINE_QUEUE_SIZE = 5000  # Validated rows waiting for the submission at most; validation pauses when the queue is full
+INCREMENTAL_VALIDATION = True  # Reuse the results of rows validated in previous runs (process_data/validation_cache.npz) and validate only new rows (not while streaming)
 
-# Validation messages
-INCOMPLETE_DATA_MESSAGE = "Faltan datos" 
-INVALID_DATE_MESSAGE = "Fecha de Solicitud no está en formato fecha"
-INVALID_NAME_TEXT_MESSAGE = "Ingrese Nombre válido"
-INVALID_PRODUCT_TEXT_MESSAGE = "Ingrese un Producto válido"
-INVALID_NUMBER_MESSAGE = "Ingrese un monto válido"
-INVALID_SPECIAL_CHARACTERS_MESSAGE = "Caracteres especiales no permitidos"
+# Range of Excel numeric dates accepted as dates (serials mapping to ordinals 1..9999-12-31)
+EXCEL_DATE_MIN_SERIAL = 2 - datetime(1900, 1, 1).toordinal() + 1
+EXCEL_DATE_MAX_SERIAL = 2 - datetime(1900, 1, 1).toordinal() + datetime.max.toordinal()
 
 def configure_logging():
     """
@@ -25,141 +40,269 @@ def configure_logging():
     if not os.path.exists(LOGS_DIRECTORY):
         os.makedirs(LOGS_DIRECTORY)
     
-    # Clear any existing logging configuration
-    logging.basicConfig(
-        filename=LOGS_FILE,
-        level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(message)s",
-        force=True  # Force reconfiguration of logging
-    )
+    # Clear any existing logging configuration; records are written to the file by a background thread
+    configure_queued_logging(LOGS_FILE)
     logging.info("Logging configured successfully.")
 
-def is_excel_date(value):
+def append_observation(observations, mask, message):
     """
-    Check if the value is a valid Excel date (numeric format).
-    Excel stores dates as numbers, where 1 = 1900-01-01.
+    Appends `message` to the observations of the rows selected by `mask`, separated by "; ".
     """
-    if isinstance(value, (int, float)):
+    separators = np.where(observations == "", "", "; ")
+    return np.where(mask, observations + separators + message, observations)
+
+def is_date_text(value, date_formats):
+    """
+    Check if the value is a string that represents a date in one of `date_formats`.
+    """
+    for date_format in date_formats:
         try:
-            # Convert Excel numeric date to datetime
-            datetime.fromordinal(datetime(1900, 1, 1).toordinal() + int(value) - 2)
+            datetime.strptime(value, date_format)
             return True
         except ValueError:
-            return False
+            pass
     return False
 
-def is_datetime_object(value):
+def column_failures(rule, column, types, is_str, is_blank):
     """
-    Check if the value is already a datetime object.
+    Applies the rule of one column to all its values at once.
+    Yields (mask, message) for the type, pattern and blank checks of the rule, in that order.
+    Type and pattern checks only apply to non-empty values; missing data is reported separately.
     """
-    return isinstance(value, datetime)
+    is_truthy = column.astype(bool).to_numpy()
+
+    if rule.type == "text":
+        yield is_truthy & ~is_str, rule.type_message
+    elif rule.type == "number":
+        is_number = types.isin([int, float, bool]).to_numpy()
+        yield is_truthy & ~is_number, rule.type_message
+    elif rule.type == "date":
+        # An Excel numeric date, a datetime, or a text in one of the accepted date formats
+        is_number = types.isin([int, float]).to_numpy()
+        serials = np.trunc(pd.to_numeric(column.where(is_number), errors="coerce").to_numpy(dtype=float))
+        with np.errstate(invalid="ignore"):
+            is_date = (serials >= EXCEL_DATE_MIN_SERIAL) & (serials <= EXCEL_DATE_MAX_SERIAL)
+        is_date |= types.eq(bool).to_numpy()
+        is_date |= types.isin([datetime, pd.Timestamp]).to_numpy()
+        if rule.date_formats and is_str.any():
+            is_date |= column.where(is_str, "").map(lambda value: is_date_text(value, rule.date_formats)).to_numpy(dtype=bool)
+        yield is_truthy & ~is_date, rule.type_message
+
+    if rule.pattern is not None:
+        matches = column.where(is_str, "").str.fullmatch(rule.pattern).to_numpy(dtype=bool)
+        yield is_truthy & is_str & ~matches, rule.pattern_message
 
-def is_date_string(value):
+    if rule.blank_message:
+        yield is_blank, rule.blank_message
+
+def validate_columns(data, plan):
     """
-    Check if the value is a string that represents a valid date in the format "dd-mm-yyyy".
+    Validates the worktray data columns at once with the rules of the form plan.
+    `data` is a DataFrame (object dtype) with the data columns of the plan, holding the raw cell values.
+    Returns a tuple (is_valid, observations) of arrays with the "Datos correctos" and "Observaciones" values per row.
+    Missing data is reported first, then the failures of each column in schema order.
     """
-    if isinstance(value, str):
-        try:
-            datetime.strptime(value, "%d-%m-%Y")
-            return True
-        except ValueError:
-            return False
-    return False
+    checked = []
+    for rule in plan.rules:
+        column = data[rule.name]
+        types = column.map(type)
+        is_str = types.eq(str).to_numpy()
+        is_blank = types.eq(type(None)).to_numpy() | column.where(is_str, "-").str.strip().eq("").to_numpy(dtype=bool)
+        checked.append((rule, column, types, is_str, is_blank))
 
-def is_text(value):
+    # Empty required fields
+    incomplete = np.zeros(len(data), dtype=bool)
+    for rule, _, _, _, is_blank in checked:
+        if rule.required:
+            incomplete |= is_blank
+
+    observations = append_observation(np.full(len(data), "", dtype=object), incomplete, plan.incomplete_message)
+    is_invalid = incomplete
+    for checks in checked:
+        for mask, message in column_failures(*checks):
+            is_invalid = is_invalid | mask
+            if message:
+                observations = append_observation(observations, mask, message)
+    return ~is_invalid, observations
+
+def validate_chunk(chunk, plan):
     """
-    Check if the value is a valid text (string).
+    Validates a list of work items at once, setting their "Datos correctos" and "Observaciones".
+    Returns the observation texts of the items, in order.
     """
-    return isinstance(value, str)
+    data = pd.DataFrame([item.data for item in chunk], columns=plan.data_columns, dtype=object)
+    is_valid, observations = validate_columns(data, plan)
+    observations = observations.tolist()
+
+    # Each distinct observation text of the chunk is looked up once
+    codes = {text: observation_codes.code(text) for text in set(observations)}
+    for item, row_valid, row_observations in zip(chunk, is_valid.tolist(), observations):
+        item.valid = row_valid  # Datos correctos (column E)
+        item.observation = codes[row_observations]  # Observaciones (column G)
+    return observations
 
-def is_number(value):
+def validate_rows(items, plan, chunk_size=VALIDATION_CHUNK_SIZE, incremental=INCREMENTAL_VALIDATION):
     """
-    Check if the value is a valid number (integer or float).
+    Validates `items`, an iterable of work items, in chunks of `chunk_size` rows with the form plan.
+    Yields each work item in order with "Datos correctos" and "Observaciones" set.
+    With `incremental`, rows whose exact data values were validated in a previous run take their result
+    from the validation cache, and only the other rows are validated (and then added to the cache).
+    The cache is emptied when the validation rules or messages of the form schema change.
     """
-    return isinstance(value, (int, float))
+    items = iter(items)
+    cache = ValidationCache(plan.validation_fingerprint) if incremental else None
+    try:
+        while True:
+            chunk = list(islice(items, chunk_size))
+            if not chunk:
+                return
+            add_stage_rows("validate", len(chunk))
+            if cache is None:
+                validate_chunk(chunk, plan)
+                yield from chunk
+                continue
+
+            keys = [validation_key(item.data) for item in chunk]
+            cached = cache.lookup(keys)
+            new_rows = [(key, item) for key, item, result in zip(keys, chunk, cached) if result is None]
+            if new_rows:
+                observations = validate_chunk([item for _, item in new_rows], plan)
+                cache.store((key, item.valid, text) for (key, item), text in zip(new_rows, observations))
+            for item, result in zip(chunk, cached):
+                if result is not None:
+                    item.valid = result[0]  # Datos correctos (column E)
+                    item.set_observation(result[1])  # Observaciones (column G)
+                yield item
+    finally:
+        if cache is not None:
+            cache.close()
 
-def contains_special_characters(value):
+def validate_in_background(rows, plan, queue_size=PIPELINE_QUEUE_SIZE, chunk_size=PIPELINE_CHUNK_SIZE, incremental=INCREMENTAL_VALIDATION):
     """
-    Check if the value contains special characters that are not allowed.
-    Only letters, spaces, and some special characters (like accents) are allowed.
+    Validates `rows`, an iterable of (worktray row, values), in a background thread and yields the work items
+    as soon as their chunk is validated, through a queue of at most `queue_size` items. When the consumer
+    falls behind, validation waits for room in the queue, so memory stays bounded.
+    An error in the validation thread is raised here. Stopping early stops the thread.
+    `incremental` uses the validation cache as validate_rows does.
+    The time the thread spends reading and validating rows (not waiting for room in the queue) is added
+    to the "validate" stage, which would otherwise be counted only within the stage consuming the items.
     """
-    if not isinstance(value, str):
+    items = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    finished = object()  # Marks the end of the rows
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
         return False
-    # Regular expression to allow letters, spaces, and some special characters (like accents)
-    pattern = r'^[a-zA-ZáéíóúÁÉÍÓÚñÑüÜ\s\-\.]+$'
-    return not bool(re.match(pattern, value))
 
-def validate_worktray():
+    def produce():
+        busy = 0.0
+        try:
+            validated = validate_rows(work_items(rows, plan), plan, chunk_size, incremental)
+            while True:
+                started = time.perf_counter()
+                item = next(validated, finished)
+                busy += time.perf_counter() - started
+                if item is finished:
+                    break
+                if not put(item):
+                    validated.close()
+                    return
+            put(finished)
+        except Exception as e:
+            put(e)
+        finally:
+            add_stage_time("validate", busy)
+
+    producer = threading.Thread(target=produce, name="validation", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = items.get()
+            if item is finished:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+def validate_worktray_streaming(worktray_path, plan):
+    """
+    Validates the worktray reading it in read-only mode and writing the results
+    to a new worktray that replaces the original at the end. The validation cache is not used,
+    since it is held in memory and grows with the new rows of the run.
+    """
+    worktray = StreamingWorktray(worktray_path, plan=plan)
+    status_index = StatusIndex(status_index_path_for(worktray_path))
+    try:
+        for item in validate_rows(work_items(worktray.rows(), plan), plan, incremental=False):
+            worktray.append(item.values())
+            status_index.record_item(item)
+        worktray.commit()
+    except Exception:
+        worktray.close()
+        raise
+    finally:
+        status_index.close()
+
+@timed_stage("validate")
+def validate_worktray(streaming=STREAMING_MODE, backend=None, storage=None, plan=None):
     """
     Validates all rows in the worktray. If any field is empty, sets "Datos correctos" to FALSE
     and adds a comment in the "Observaciones" column. Also validates the date format in "Fecha de Solicitud",
     text format in "Nombre" and "Producto", number format in "Monto", and special characters in "Nombre" and "Producto".
     Maintains the original formatting.
+    The worktray is read and updated through the worktray storage (`backend`, worktray_storage.WORKTRAY_BACKEND
+    by default). With `streaming` and the xlsx backend, it is processed row by row so memory use stays flat.
+    When an open `storage` is given (fused pipeline), it is updated in place and persisting it is left to the caller.
+    The columns and rules come from the form `plan` (the compiled input/form_schema.json by default).
+    The status of every row is recorded in the status index next to the worktray.
     """
     try:
-        # Path to the worktray file
-        worktray_path = os.path.join(PROCESS_DATA_DIRECTORY, WORKTRAY_FILE)
-        
-        # Read the worktray
-        logging.info(f"Reading the worktray from: {worktray_path}")
-        worktray_wb = load_workbook(worktray_path)
-        worktray_ws = worktray_wb.active
-        
-        # Iterate through rows (skip the header row)
-        for row in worktray_ws.iter_rows(min_row=2, max_row=worktray_ws.max_row, min_col=1, max_col=7):
-            is_valid = True
-            observations = []
-            
-            # Check for empty fields (columns A to D: Nombre, Producto, Monto, Fecha de Solicitud)
-            for cell in row[:4]:  # Columns A to D
-                if cell.value is None or str(cell.value).strip() == "":
-                    is_valid = False
-                    observations.append(INCOMPLETE_DATA_MESSAGE)
-                    break  # Stop checking other fields if one is empty
-
-            # Validate "Nombre" (column A) and "Producto" (column B) as text
-            nombre = row[0].value  # Column A
-            producto = row[1].value  # Column B
-            if nombre and not is_text(nombre):
-                is_valid = False
-                observations.append(f"{INVALID_NAME_TEXT_MESSAGE}")
-            elif nombre and contains_special_characters(nombre):
-                is_valid = False
-                observations.append(f"{INVALID_SPECIAL_CHARACTERS_MESSAGE}")
-            if producto is None or str(producto).strip() == "":
-                is_valid = False
-                observations.append(f"{INVALID_PRODUCT_TEXT_MESSAGE}")
-            
-            # Validate "Monto" (column C) as a number
-            monto = row[2].value  # Column C
-            if monto and not is_number(monto):
-                is_valid = False
-                observations.append(f"{INVALID_NUMBER_MESSAGE}")
-            
-            # Validate date format in "Fecha de Solicitud" (column D)
-            fecha_solicitud = row[3].value
-            if fecha_solicitud:
-                # Check if the value is a valid Excel date, datetime object, or a valid date string
-                if not (is_excel_date(fecha_solicitud) or is_datetime_object(fecha_solicitud)):
-                    if is_date_string(fecha_solicitud):
-                        # If it's a date string, it's invalid because we expect a real date, not a string
-                        is_valid = False
-                        observations.append(INVALID_DATE_MESSAGE)
-                    else:
-                        # If it's not a date string, it's also invalid
-                        is_valid = False
-                        observations.append(INVALID_DATE_MESSAGE)
-            else:
-                # If fecha_solicitud is empty, it's already handled by the empty field check
-                pass
-            
+        plan = plan or load_form_plan()
+        status_columns = (plan.valid_index, plan.observations_index)  # Datos correctos, Observaciones
+
+        if storage is not None:
+            status_index = StatusIndex(status_index_path_for(storage.path))
+            try:
+                for item in validate_rows(work_items(storage.read_rows(), plan), plan):
+                    storage.update_row(item.row, item.values(), status_columns)
+                    status_index.record_item(item)
+            finally:
+                status_index.close()
+            logging.info(f"Worktray validation completed in memory for: {storage.path}")
+            return True
+
+        backend = backend or worktray_storage.WORKTRAY_BACKEND
+
+        if streaming and backend == "xlsx":
+            worktray_path = os.path.join(PROCESS_DATA_DIRECTORY, WORKTRAY_FILE)
+            logging.info(f"Streaming the worktray from: {worktray_path}")
+            validate_worktray_streaming(worktray_path, plan)
+            logging.info(f"Worktray validation completed and saved to: {worktray_path}")
+            return True
+
+        storage = worktray_storage.open_worktray_storage(backend, plan=plan)
+        status_index = StatusIndex(status_index_path_for(storage.path))
+        try:
             # Update "Datos correctos" (column E) and "Observaciones" (column G)
-            row[4].value = is_valid  # Datos correctos (column E)
-            row[6].value = "; ".join(observations) if observations else ""  # Observaciones (column G)
-        
-        # Save the updated worktray
-        worktray_wb.save(worktray_path)
-        logging.info(f"Worktray validation completed and saved to: {worktray_path}")
+            for item in validate_rows(work_items(storage.read_rows(), plan), plan):
+                storage.update_row(item.row, item.values(), status_columns)
+                status_index.record_item(item)
+
+            # Save the updated worktray
+            storage.commit()
+        finally:
+            storage.close()
+            status_index.close()
+        logging.info(f"Worktray validation completed and saved to: {storage.path}")
         
         return True
     
@@ -169,6 +312,11 @@ def validate_worktray():
 
 # Execute the function if the script is run directly
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate the rows of the worktray.")
+    parser.add_argument("--profile", action="store_true", help=PROFILE_ARGUMENT_HELP)
+    if parser.parse_args().profile:
+        set_profiling()
+
     # Configure logging
     if not os.path.exists("_logs"):
         os.makedirs("_logs")
@@ -177,6 +325,7 @@ if __name__ == "__main__":
     logging.info("---- Starting module 'input_file_processment' ----")
     # Validate the worktray
     success = validate_worktray()
+    export_metrics()
     
     if not success:
         logging.error("Worktray validation failed. Check the logs for details.")
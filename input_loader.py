@@ -0,0 +1,53 @@
+import logging
+import os
+import pandas as pd
+from openpyxl import load_workbook
+
+# Parsed input files, keyed by absolute path: {path: (mtime_ns, size, DataFrame)}
+input_data_cache = {}
+
+def read_input_header(file_path):
+    """
+    Reads only the header row of an Excel file.
+    Returns a tuple (columns, row_count) where row_count is the number of data rows
+    according to the sheet dimensions (it may include formatted but empty rows).
+    row_count is None when the sheet has no dimensions (e.g. written by openpyxl in write-only mode
+    or by other streaming exporters); only parsing the body tells how many rows it has.
+    """
+    workbook = load_workbook(file_path, read_only=True)
+    try:
+        worksheet = workbook.active
+        header = next(worksheet.iter_rows(min_row=1, max_row=1, values_only=True), ())
+        columns = list(header)
+        # Ignore empty trailing header cells, as pandas does
+        while columns and columns[-1] is None:
+            columns.pop()
+        if worksheet.max_row is None:
+            return columns, None
+        return columns, max(0, worksheet.max_row - 1)
+    finally:
+        workbook.close()
+
+def load_input_data(file_path):
+    """
+    Parses the body of an Excel file once and caches the result for the rest of the run.
+    The cache entry is reused while the file keeps the same modification time and size.
+    The returned DataFrame is shared between callers and must not be modified.
+    """
+    cache_key = os.path.abspath(file_path)
+    stat = os.stat(file_path)
+    cached = input_data_cache.get(cache_key)
+    if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        logging.info(f"Using cached input data for: {file_path}")
+        return cached[2]
+
+    logging.info(f"Parsing input data from: {file_path}")
+    input_data = pd.read_excel(file_path)
+    input_data_cache[cache_key] = (stat.st_mtime_ns, stat.st_size, input_data)
+    return input_data
+
+def clear_input_cache():
+    """
+    Drops all cached input data.
+    """
+    input_data_cache.clear()
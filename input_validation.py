@@ -1,8 +1,8 @@
 import logging
 import os
-import pandas as pd
-import tkinter as tk
-from tkinter import messagebox
+from input_loader import read_input_header, load_input_data
+from queued_logging import configure_queued_logging
+from headless import is_headless
 
 # Configurable parameters
 LOGS_DIRECTORY = "_logs"  # Directory to store logs
@@ -23,19 +23,23 @@ def configure_logging():
     if not os.path.exists(LOGS_DIRECTORY):
         os.makedirs(LOGS_DIRECTORY)
     
-    # Clear any existing logging configuration
-    logging.basicConfig(
-        filename=LOGS_FILE,
-        level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(message)s",
-        force=True  # Force reconfiguration of logging
-    )
+    # Clear any existing logging configuration; records are written to the file by a background thread
+    configure_queued_logging(LOGS_FILE)
     logging.info("Logging configured successfully.")
 
 def show_popup_centered(title, message, popup_type="info"):
     """
     Displays a centered popup without extra icons or overlapping windows.
+    In headless mode the message is printed to stdout instead and questions are confirmed automatically.
     """
+    if is_headless():
+        logging.info(f"Headless mode, popup not shown: {title}: {message}")
+        print(f"{title}: {message}")
+        return True if popup_type == "question" else None
+
+    import tkinter as tk  # Imported only when a dialog is actually shown
+    from tkinter import messagebox
+
     root = tk.Tk()
     root.withdraw()
     root.attributes('-topmost', True)
@@ -48,34 +52,36 @@ def show_popup_centered(title, message, popup_type="info"):
         return messagebox.askokcancel(title, message, parent=root)
     return None
 
-def validate_input_file():
+def validate_input_file(input_file_path=None):
     """
     Validates the input file based on the following rules:
     1. The file must exist.
     2. The file must follow the same format as the template.
     3. The file must have at least one row of data.
+    The file is input/input_file.xlsx unless `input_file_path` is given.
     Returns True if all validations pass, otherwise False.
     """
     global input_file_exists, input_file_format, input_file_first_row
 
     try:
-        input_file_path = os.path.join(INPUT_DIRECTORY, INPUT_FILE)
+        input_file_path = input_file_path or os.path.join(INPUT_DIRECTORY, INPUT_FILE)
         if not os.path.exists(input_file_path):
-            logging.error(f"The input file '{INPUT_FILE}' does not exist in the '{INPUT_DIRECTORY}' directory.")
+            logging.error(f"The input file '{input_file_path}' does not exist.")
             input_file_exists = False
             return False
         input_file_exists = True
 
+        # Compare the headers only; the body is parsed once below
         template_path = os.path.join(INPUT_DIRECTORY, INPUT_TEMPLATE_FILE)
-        template_columns = pd.read_excel(template_path).columns.tolist()
-        input_columns = pd.read_excel(input_file_path).columns.tolist()
+        template_columns, _ = read_input_header(template_path)
+        input_columns, input_row_count = read_input_header(input_file_path)
 
         input_file_format = template_columns == input_columns
         if not input_file_format:
             logging.error("The input file does not follow the correct format.")
 
-        input_data = pd.read_excel(input_file_path)
-        input_file_first_row = len(input_data) > 0
+        # The sheet dimensions are enough to reject an empty file without parsing it (when the sheet has them)
+        input_file_first_row = input_row_count != 0 and len(load_input_data(input_file_path)) > 0
         if not input_file_first_row:
             logging.error("The input file has no rows of data.")
     
@@ -116,7 +122,7 @@ def input_validation_module():
         return show_validation_failed_popup()
 
     input_file_path = os.path.join(INPUT_DIRECTORY, INPUT_FILE)
-    input_data = pd.read_excel(input_file_path)
+    input_data = load_input_data(input_file_path)
     transaction_count = len(input_data)
     show_popup_centered("Carga de Transacciones", f"Se intentarán cargar un total de {transaction_count} transacciones.", "info")
     logging.info("Input file validation passed. Returning True.")
@@ -1,13 +1,36 @@
+import argparse
 import logging
 import os
+import sys
 from input_validation import input_validation_module
 from worktray_creation import create_worktray
+import input_file_processment
+import google_forms_submission
 from input_file_processment import validate_worktray
-from google_forms_submission import submit_to_google_forms
+from google_forms_submission import submit_to_google_forms, clear_submission_journal
+import worktray_storage
+from sharded_run import run_sharded
+import run_metrics
+from headless import is_headless, set_headless, HEADLESS_ENVIRONMENT_VARIABLE
+from queued_logging import configure_queued_logging
+from stage_profiling import PROFILE_ARGUMENT_HELP, set_profiling
 
 # Configurable parameters
 LOGS_DIRECTORY = "_logs"  # Directory to store logs
 LOGS_FILE = os.path.join(LOGS_DIRECTORY, "process_logs.log")  # Log file path
+EXPORT_WORKTRAY = True  # Export worktray.xlsx at the end of the run when the worktray is kept in another backend
+FUSED_PIPELINE = True  # Keep one worktray in memory across all steps and save it once at the end
+FUSED_STAGE_CHECKPOINTS = False  # In the fused pipeline, also save the worktray after creation and validation
+FUSED_CHECKPOINT_INTERVAL = 0  # In the fused pipeline, rows between saves during submission (0 relies on the journal)
+OVERLAPPED_PIPELINE = True  # In the fused pipeline, validate and submit at the same time (rows are posted as soon as they pass validation)
+SHARDS = 1  # Number of worker processes for validation and submission (1 runs everything in this process)
+
+# Exit status of the process
+EXIT_SUCCESS = 0  # All steps completed and every row was submitted
+EXIT_STEP_FAILED = 1  # A step failed (see the logs)
+EXIT_INPUT_REJECTED = 2  # The input file is invalid or the run was cancelled
+EXIT_ROWS_NOT_SUBMITTED = 3  # All steps completed but some rows were not submitted (invalid data or form errors)
+EXIT_UNEXPECTED_ERROR = 4  # Unexpected error
 
 def configure_logging():
     """
@@ -16,58 +39,153 @@ def configure_logging():
     if not os.path.exists(LOGS_DIRECTORY):
         os.makedirs(LOGS_DIRECTORY)
     
-    # Clear any existing logging configuration
-    logging.basicConfig(
-        filename=LOGS_FILE,
-        level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(message)s",
-        force=True  # Force reconfiguration of logging
-    )
+    # Clear any existing logging configuration; records are written to the file by a background thread
+    configure_queued_logging(LOGS_FILE)
     logging.info("Logging configured successfully.")
 
-def main():
+def streaming_requested():
+    """
+    Tells whether STREAMING_MODE is set in input_file_processment.py or google_forms_submission.py
+    for the xlsx backend, where it makes those steps read and write the worktray row by row.
+    """
+    return worktray_storage.WORKTRAY_BACKEND == "xlsx" and (
+        input_file_processment.STREAMING_MODE or google_forms_submission.STREAMING_MODE
+    )
+
+def run_steps(storage=None):
+    """
+    Runs the worktray steps (creation, validation and submission).
+    When `storage` is given, all steps work on that in-memory worktray and none of them saves it,
+    and with OVERLAPPED_PIPELINE validation and submission run at the same time.
+    Returns True if all steps succeeded, otherwise False.
+    """
+    # Step 2: Create the worktray
+    logging.info("Step 2: Creating the worktray.")
+    worktray_created = create_worktray(storage=storage)
+    if worktray_created.empty:
+        logging.error("Worktray creation failed. Process terminated.")
+        return False
+    logging.info("Worktray created successfully.")
+    if storage is not None and FUSED_STAGE_CHECKPOINTS:
+        storage.commit()
+
+    if storage is not None and OVERLAPPED_PIPELINE:
+        # Steps 3 and 4: Validate the rows and submit them as they pass
+        logging.info("Steps 3 and 4: Validating the worktray and submitting data to Google Forms (overlapped).")
+        if not submit_to_google_forms(storage=storage, checkpoint_interval=FUSED_CHECKPOINT_INTERVAL, validate=True):
+            logging.error("Worktray validation or Google Forms submission failed. Process terminated.")
+            return False
+        logging.info("Worktray validation and Google Forms submission completed successfully.")
+        return True
+
+    # Step 3: Validate the worktray
+    logging.info("Step 3: Validating the worktray.")
+    validation_success = validate_worktray(storage=storage)
+    if not validation_success:
+        logging.error("Worktray validation failed. Process terminated.")
+        return False
+    logging.info("Worktray validation completed successfully.")
+    if storage is not None and FUSED_STAGE_CHECKPOINTS:
+        storage.commit()
+
+    # Step 4: Submit data to Google Forms
+    logging.info("Step 4: Submitting data to Google Forms.")
+    if storage is not None:
+        submission_success = submit_to_google_forms(storage=storage, checkpoint_interval=FUSED_CHECKPOINT_INTERVAL)
+    else:
+        submission_success = submit_to_google_forms()
+    if not submission_success:
+        logging.error("Google Forms submission failed. Process terminated.")
+        return False
+    logging.info("Google Forms submission completed successfully.")
+    return True
+
+def main(fused=FUSED_PIPELINE, shards=SHARDS):
     """
     Main function to execute all modules in sequence:
-    1. Create the worktray.
-    2. Validate the worktray.
-    3. Submit data to Google Forms.
+    1. Validate the input file.
+    2. Create the worktray.
+    3. Validate the worktray.
+    4. Submit data to Google Forms.
+    5. Export the worktray report (non-xlsx backends).
+    With `fused`, steps 2 to 4 share one in-memory worktray that is saved once at the end
+    instead of being loaded and saved by every step. When STREAMING_MODE is set (streaming_requested),
+    the steps run on the worktray file instead, so memory use does not grow with the number of rows.
+    With more than one shard, steps 3 and 4 run in `shards` worker processes and their worktrays
+    are merged into process_data/worktray.xlsx.
+    The metrics of the run are written to _logs/metrics.json and _logs/metrics.prom at the end.
+    Returns the exit status of the run (EXIT_SUCCESS, EXIT_STEP_FAILED, ...).
     """
+    run_metrics.reset_metrics()
     try:
         logging.info("-------STARTING THE PROCESS-------")
         # Step 1: Create validating the input
         logging.info("Step 1: Validating the input file.")
         input_validation = input_validation_module()
-        if input_validation:
-            worktray_created = create_worktray()
-            # Step 2: Create the worktray
-            logging.info("Step 2: Creating the worktray.")
-            if worktray_created.empty:
-                logging.error("Worktray creation failed. Process terminated.")
-                return
-            logging.info("Worktray created successfully.")
-
-            # Step 2: Validate the worktray
-            logging.info("Step 3: Validating the worktray.")
-            validation_success = validate_worktray()
-            if not validation_success:
-                logging.error("Worktray validation failed. Process terminated.")
-                return
-            logging.info("Worktray validation completed successfully.")
+        if not input_validation:
+            logging.error("Input validation failed or was cancelled. Process terminated.")
+            return EXIT_INPUT_REJECTED
+        if shards > 1:
+            logging.info(f"Steps 2 to 4: Running the worktray in {shards} shards.")
+            if not run_sharded(shards):
+                logging.error("Sharded run failed. Process terminated.")
+                return EXIT_STEP_FAILED
+            logging.info("All steps completed successfully.")
+        else:
+            if fused and streaming_requested():
+                logging.info("STREAMING_MODE is set: the steps stream the worktray file instead of sharing an in-memory worktray.")
+                fused = False
+            storage = worktray_storage.open_worktray_storage(in_memory=True) if fused else None
+            try:
+                steps_success = run_steps(storage)
+            finally:
+                if storage is not None:
+                    # Save the fused worktray once, also when a step failed
+                    storage.commit()
+                    storage.close()
+                    logging.info(f"Worktray saved to: {storage.path}")
+            if not steps_success:
+                return EXIT_STEP_FAILED
+            if storage is not None:
+                clear_submission_journal()
 
-            # Step 3: Submit data to Google Forms
-            logging.info("Step 4: Submitting data to Google Forms.")
-            submission_success = submit_to_google_forms()
-            if not submission_success:
-                logging.error("Google Forms submission failed. Process terminated.")
-                return
-            logging.info("Google Forms submission completed successfully.")
+            # Step 5: Export the worktray report
+            if EXPORT_WORKTRAY and worktray_storage.WORKTRAY_BACKEND != "xlsx":
+                logging.info("Step 5: Exporting the worktray.")
+                if not worktray_storage.export_worktray():
+                    logging.error("Worktray export failed. Process terminated.")
+                    return EXIT_STEP_FAILED
+                logging.info("Worktray exported successfully.")
 
             # Final success message
             logging.info("All steps completed successfully.")
 
+        if run_metrics.current_metrics.counters.get("rows_not_submitted"):
+            return EXIT_ROWS_NOT_SUBMITTED
+        return EXIT_SUCCESS
+
     except Exception as e:
         logging.error(f"An unexpected error occurred: {str(e)}", exc_info=True)
+        return EXIT_UNEXPECTED_ERROR
+    finally:
+        run_metrics.export_metrics()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the rows of input/input_file.xlsx into Google Forms.")
+    parser.add_argument(
+        "--headless", action="store_true",
+        help=f"Run without dialogs, confirming automatically and printing a summary (also enabled by {HEADLESS_ENVIRONMENT_VARIABLE}=1)"
+    )
+    parser.add_argument("--profile", action="store_true", help=PROFILE_ARGUMENT_HELP)
+    args = parser.parse_args()
+    if args.headless:
+        set_headless()
+    if args.profile:
+        set_profiling()
+
     configure_logging()
-    main()
\ No newline at end of file
+    exit_status = main()
+    logging.info(f"Process finished with exit status {exit_status}.")
+    if is_headless():
+        print(f"Process finished with exit status {exit_status}. Logs: {LOGS_FILE}")
+    sys.exit(exit_status)
\ No newline at end of file
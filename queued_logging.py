@@ -0,0 +1,50 @@
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+# Configurable parameters
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+# Background listener that writes the queued records to the log file
+log_listener = None
+
+def configure_queued_logging(log_file, level=logging.INFO, log_format=LOG_FORMAT):
+    """
+    Configures the root logger to put records on an in-memory queue; a background thread
+    writes them to `log_file`. Logging calls never wait for the disk.
+    Replaces any previous logging configuration (like logging.basicConfig(force=True)).
+    """
+    global log_listener
+    previous_listener = log_listener
+
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setFormatter(logging.Formatter(log_format))
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))  # The file handler adds time and level
+    logging.basicConfig(level=level, handlers=[queue_handler], force=True)
+
+    log_listener = QueueListener(log_queue, file_handler)
+    log_listener.start()
+    stop_listener(previous_listener)
+
+def stop_listener(listener):
+    """
+    Writes the records still queued for `listener`, stops it and closes its handlers.
+    """
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+def stop_queued_logging():
+    """
+    Writes the queued records and stops the background listener.
+    """
+    global log_listener
+    stop_listener(log_listener)
+    log_listener = None
+
+# Flush the queue when the process exits
+atexit.register(stop_queued_logging)
@@ -0,0 +1,80 @@
+from urllib.parse import urlsplit
+
+# Configurable parameters
+CONFIRMATION_MARKERS = ("Gracias",)  # Texts of the confirmation page, looked for only when the status alone does not decide
+RESPONSE_SCAN_LIMIT = 16384  # Maximum bytes of a body read to look for the confirmation markers
+RESPONSE_DRAIN_LIMIT = 262144  # Unread body bytes discarded (not decoded) so the connection can be reused; larger bodies close it (0 always closes)
+LOGIN_HOSTS = ("accounts.google.com",)  # Hosts of a sign-in page (the form only accepts signed-in users)
+CLOSED_FORM_PATH = "/closedform"  # Path Google Forms redirects to when the form no longer accepts responses
+
+# Outcome codes of a form submission response
+RESPONSE_ACCEPTED = 1  # The form recorded the response
+RESPONSE_THROTTLED = 2  # 429: slow down and retry
+RESPONSE_SERVER_ERROR = 3  # Transient server error (5xx): retry
+RESPONSE_LOGIN_REQUIRED = 4  # Redirected to a sign-in page
+RESPONSE_FORM_CLOSED = 5  # Redirected to the "form closed" page
+RESPONSE_REJECTED = 6  # Any other response (e.g. 400 for an entry the form does not accept)
+RESPONSE_OUTCOME_NAMES = {
+    RESPONSE_ACCEPTED: "accepted",
+    RESPONSE_THROTTLED: "throttled",
+    RESPONSE_SERVER_ERROR: "server_error",
+    RESPONSE_LOGIN_REQUIRED: "login_required",
+    RESPONSE_FORM_CLOSED: "form_closed",
+    RESPONSE_REJECTED: "rejected",
+}
+
+def read_body_prefix(response, limit=RESPONSE_SCAN_LIMIT):
+    """
+    Reads at most `limit` bytes of a streamed response body and returns them as text.
+    The rest of the body is left unread.
+    """
+    try:
+        prefix = response.raw.read(limit, decode_content=True) or b""
+    except Exception:
+        prefix = b""
+    return prefix.decode(response.encoding or "utf-8", errors="replace")
+
+def classify_response(response, retry_status_codes=(429, 500, 502, 503, 504)):
+    """
+    Classifies the response of a form submission sent with stream=True, deciding from the status code,
+    the redirects followed and the final URL whenever possible. Only an answer none of these decide
+    has its body looked at, and then only its first RESPONSE_SCAN_LIMIT bytes.
+    Returns a tuple (outcome code, detail) where detail is a text for the log (URL or body prefix).
+    """
+    status_code = response.status_code
+    if status_code == 429:
+        return RESPONSE_THROTTLED, ""
+    if status_code in retry_status_codes or status_code >= 500:
+        return RESPONSE_SERVER_ERROR, ""
+
+    # Redirects followed on the way (requests keeps them in history)
+    final_url = urlsplit(response.url or "")
+    if final_url.hostname in LOGIN_HOSTS:
+        return RESPONSE_LOGIN_REQUIRED, response.url
+    if final_url.path.endswith(CLOSED_FORM_PATH):
+        return RESPONSE_FORM_CLOSED, response.url
+
+    if status_code == 200:
+        return RESPONSE_ACCEPTED, ""
+
+    # Unusual answer: look for the confirmation page in the beginning of the body
+    prefix = read_body_prefix(response)
+    if any(marker in prefix for marker in CONFIRMATION_MARKERS):
+        return RESPONSE_ACCEPTED, ""
+    return RESPONSE_REJECTED, prefix
+
+def release_response(response, drain_limit=RESPONSE_DRAIN_LIMIT):
+    """
+    Discards what is left of a streamed body without decoding it, up to `drain_limit` bytes,
+    so that its keep-alive connection goes back to the pool; a longer body closes the connection instead.
+    """
+    try:
+        remaining = drain_limit
+        while remaining > 0:
+            chunk = response.raw.read(min(remaining, 65536), decode_content=False)
+            if not chunk:
+                break
+            remaining -= len(chunk)
+    except Exception:
+        pass
+    response.close()
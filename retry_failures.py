@@ -0,0 +1,131 @@
+import argparse
+import logging
+import os
+from google_forms_submission import (
+    SUBMISSION_WORKERS, MAX_REQUESTS_PER_SECOND, SKIP_PREVIOUSLY_SUBMITTED, HTTP_POOL_SIZE,
+    RateLimiter, get_http_session, submit_rows, show_results_popup
+)
+import worktray_storage
+from form_plan import load_form_plan
+from status_index import StatusIndex, status_index_path_for, STATUS_FAILED, STATUS_DEFERRED
+from circuit_breaker import CircuitBreaker, CIRCUIT_FAILURE_THRESHOLD
+from submission_index import SubmissionIndex
+from submission_journal import SubmissionJournal, journal_path_for
+from work_items import work_items
+from run_metrics import timed_stage, set_counter, export_metrics
+from queued_logging import configure_queued_logging
+from stage_profiling import PROFILE_ARGUMENT_HELP, set_profiling
+
+# Configurable parameters
+LOGS_DIRECTORY = "_logs"  # Directory to store logs
+LOGS_FILE = os.path.join(LOGS_DIRECTORY, "retry_failures.log")  # Log file path
+
+def configure_logging():
+    """
+    Configures logging for the application.
+    """
+    if not os.path.exists(LOGS_DIRECTORY):
+        os.makedirs(LOGS_DIRECTORY)
+
+    # Clear any existing logging configuration; records are written to the file by a background thread
+    configure_queued_logging(LOGS_FILE)
+    logging.info("Logging configured successfully.")
+
+def rebuild_status_index(status_index, storage, plan):
+    """
+    Fills an empty status index from a full read of the worktray (e.g. a worktray validated before the
+    index existed, or the merged worktray of a sharded run). Only needed once per worktray.
+    """
+    logging.info(f"Status index is empty; rebuilding it from: {storage.path}")
+    for item in work_items(storage.read_rows(), plan):
+        status_index.record_item(item)
+    status_index.commit()
+
+@timed_stage("retry")
+def retry_failures(workers=SUBMISSION_WORKERS, requests_per_second=MAX_REQUESTS_PER_SECOND, backend=None,
+                   skip_submitted=SKIP_PREVIOUSLY_SUBMITTED, show_results=True):
+    """
+    Submits again only the rows whose last submission failed or was deferred during an outage of the form
+    endpoint, as listed by the status index next to the worktray.
+    The failed rows are read by row number and only their "Ingreso exitoso a Forms" and "Observaciones" cells are
+    updated, so the work done grows with the number of failed rows rather than with the size of the worktray
+    (the xlsx backend still loads and saves the whole file; the sqlite backend touches only those rows).
+    A journal left by an interrupted run must be resumed first with google_forms_submission.py.
+    With a backend other than xlsx, process_data/worktray.xlsx is exported again after the retry.
+    Returns True if the retry ran (and the export succeeded), otherwise False.
+    """
+    index = None
+    try:
+        backend = backend or worktray_storage.WORKTRAY_BACKEND
+        plan = load_form_plan()
+        storage = worktray_storage.open_worktray_storage(backend, plan=plan)
+        status_index = StatusIndex(status_index_path_for(storage.path))
+        try:
+            journal = SubmissionJournal(journal_path_for(storage.path))
+            if journal.load():
+                logging.error(f"An interrupted submission left {journal.path}; run google_forms_submission.py to resume it first.")
+                return False
+
+            if status_index.is_empty():
+                rebuild_status_index(status_index, storage, plan)
+            failed_rows = sorted(worktray_row for status in (STATUS_FAILED, STATUS_DEFERRED) for worktray_row, _ in status_index.rows_with(status))
+            logging.info(f"Rows to retry: {len(failed_rows)}")
+
+            counters = {"success": 0, "failure": 0, "duplicate": 0, "deferred": 0, "attempts": 0, "backoff_time": 0.0}
+            if failed_rows:
+                if skip_submitted:
+                    index = SubmissionIndex()
+                rate_limiter = RateLimiter(requests_per_second)
+                get_http_session(max(HTTP_POOL_SIZE, workers))
+                breaker = CircuitBreaker() if CIRCUIT_FAILURE_THRESHOLD > 0 else None
+
+                items = work_items(storage.read_rows_at(failed_rows), plan)
+                for item, updated in submit_rows(items, journal, rate_limiter, workers, counters, index=index, plan=plan, breaker=breaker):
+                    if updated:
+                        storage.update_row(item.row, item.values(), (plan.submitted_index, plan.observations_index))  # Ingreso exitoso a Forms, Observaciones
+                        status_index.record_item(item)
+                storage.commit()
+                status_index.commit()
+            journal.clear()
+        finally:
+            status_index.close()
+            storage.close()
+
+        logging.info(f"Rows retried successfully: {counters['success']}, rows still failing: {counters['failure']}")
+        set_counter("rows_retried", len(failed_rows))
+        set_counter("rows_submitted", counters["success"])
+        set_counter("rows_not_submitted", counters["failure"])
+        set_counter("rows_deferred", counters["deferred"])
+        logging.info(f"Requests sent: {counters['attempts']}, total backoff time: {counters['backoff_time']:.2f}s")
+
+        # Refresh the Excel report from the worktray the retry updated
+        if failed_rows and backend != "xlsx" and not worktray_storage.export_worktray(backend):
+            return False
+
+        if show_results:
+            show_results_popup(counters["success"], counters["failure"])
+        return True
+
+    except Exception as e:
+        logging.error(f"Error retrying the failed rows: {str(e)}", exc_info=True)
+        return False
+    finally:
+        if index is not None:
+            index.close()
+
+# Execute the function if the script is run directly
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Submit again only the rows whose submission failed.")
+    parser.add_argument("--profile", action="store_true", help=PROFILE_ARGUMENT_HELP)
+    if parser.parse_args().profile:
+        set_profiling()
+
+    configure_logging()
+    logging.info("---- Starting module 'retry_failures' ----")
+    success = retry_failures()
+    export_metrics()
+
+    if not success:
+        logging.error("Retry of the failed rows failed. Check the logs for details.")
+    else:
+        logging.info("Retry of the failed rows completed successfully.")
@@ -0,0 +1,282 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from stage_profiling import is_profiling, run_profiled
+
+# Configurable parameters
+METRICS_DIRECTORY = "_logs"  # Directory where the metrics of the last run are written
+METRICS_NAME = "metrics"  # Base name of the metrics files (.json and .prom)
+METRICS_PREFIX = "forms_automation"  # Prefix of the Prometheus metric names
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)  # Upper bounds of the latency histogram buckets (in seconds)
+
+# Outcomes of a single form POST
+OUTCOME_SUCCESS = "success"
+OUTCOME_HTTP_FAILURE = "http_failure"
+OUTCOME_TIMEOUT = "timeout"
+OUTCOME_CONNECTION_ERROR = "connection_error"
+REQUEST_OUTCOMES = (OUTCOME_SUCCESS, OUTCOME_HTTP_FAILURE, OUTCOME_TIMEOUT, OUTCOME_CONNECTION_ERROR)
+
+def round_or_none(value, digits=6):
+    """
+    Rounds a value that may be None.
+    """
+    return None if value is None else round(value, digits)
+
+class LatencyHistogram:
+    """
+    Cumulative latency histogram with the buckets of LATENCY_BUCKETS, in the Prometheus layout.
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        """
+        Adds one observation.
+        """
+        for index, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                break
+        else:
+            index = len(self.buckets)
+        self.counts[index] += 1
+        self.total += seconds
+        self.count += 1
+
+    def cumulative_counts(self):
+        """
+        Returns the number of observations at or below each bucket bound, ending with +Inf.
+        """
+        cumulative = []
+        running = 0
+        for count in self.counts:
+            running += count
+            cumulative.append(running)
+        return cumulative
+
+    def quantile(self, q):
+        """
+        Estimates the q-quantile by linear interpolation inside its bucket, as Prometheus'
+        histogram_quantile does. Returns None without observations.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        lower_bound = 0.0
+        previous = 0
+        for bound, cumulative in zip(self.buckets, self.cumulative_counts()):
+            if cumulative >= rank:
+                in_bucket = cumulative - previous
+                return lower_bound + (bound - lower_bound) * ((rank - previous) / in_bucket if in_bucket else 1)
+            lower_bound, previous = bound, cumulative
+        return self.buckets[-1]  # Rank falls in +Inf, which has no upper bound
+
+    def to_dict(self):
+        """
+        Returns the histogram as a JSON-serializable dict.
+        """
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "buckets": {str(bound): count for bound, count in zip(self.buckets + ("+Inf",), self.cumulative_counts())},
+            "p50": round_or_none(self.quantile(0.5)),
+            "p90": round_or_none(self.quantile(0.9)),
+            "p99": round_or_none(self.quantile(0.99)),
+        }
+
+class RunMetrics:
+    """
+    Metrics of one run: wall time and rows per stage, POST latency per outcome and run counters
+    (e.g. rows submitted).
+    Thread-safe, so submission workers can record their requests directly.
+    `labels` are added to every Prometheus series (e.g. the shard of a sharded run).
+    """
+    def __init__(self, labels=None):
+        self.lock = threading.Lock()
+        self.labels = dict(labels or {})
+        self.started = datetime.now()
+        self.stages = {}
+        self.counters = {}
+        self.latency = {outcome: LatencyHistogram() for outcome in REQUEST_OUTCOMES}
+
+    def stage_record(self, stage):
+        """
+        Returns the record of a stage, creating it on first use.
+        """
+        return self.stages.setdefault(stage, {"seconds": 0.0, "rows": 0})
+
+    def add_stage_time(self, stage, seconds):
+        """
+        Adds wall time to a stage.
+        """
+        with self.lock:
+            self.stage_record(stage)["seconds"] += seconds
+
+    def add_stage_rows(self, stage, rows):
+        """
+        Adds processed rows to a stage.
+        """
+        with self.lock:
+            self.stage_record(stage)["rows"] += rows
+
+    def set_counter(self, name, value):
+        """
+        Sets a run counter.
+        """
+        with self.lock:
+            self.counters[name] = value
+
+    def observe_request(self, outcome, seconds):
+        """
+        Records the latency of one form POST with its outcome (one of REQUEST_OUTCOMES).
+        """
+        with self.lock:
+            self.latency[outcome].observe(seconds)
+
+    def to_dict(self):
+        """
+        Returns all metrics as a JSON-serializable dict.
+        """
+        with self.lock:
+            stages = {
+                stage: {
+                    "seconds": round(record["seconds"], 3),
+                    "rows": record["rows"],
+                    "rows_per_second": round(record["rows"] / record["seconds"], 1) if record["seconds"] else None,
+                }
+                for stage, record in self.stages.items()
+            }
+            return {
+                "started": self.started.isoformat(timespec="seconds"),
+                "finished": datetime.now().isoformat(timespec="seconds"),
+                "labels": self.labels,
+                "stages": stages,
+                "counters": dict(self.counters),
+                "request_latency_seconds": {outcome: histogram.to_dict() for outcome, histogram in self.latency.items()},
+            }
+
+    def to_prometheus(self):
+        """
+        Returns all metrics in the Prometheus text exposition format.
+        """
+        def series(name, value, **labels):
+            labels = {**self.labels, **labels}
+            label_text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+            return f"{METRICS_PREFIX}_{name}{{{label_text}}} {value}" if label_text else f"{METRICS_PREFIX}_{name} {value}"
+
+        metrics = self.to_dict()
+        lines = [
+            f"# HELP {METRICS_PREFIX}_stage_duration_seconds Wall time of each pipeline stage in the last run.",
+            f"# TYPE {METRICS_PREFIX}_stage_duration_seconds gauge",
+            *(series("stage_duration_seconds", record["seconds"], stage=stage) for stage, record in metrics["stages"].items()),
+            f"# HELP {METRICS_PREFIX}_stage_rows Rows processed by each pipeline stage in the last run.",
+            f"# TYPE {METRICS_PREFIX}_stage_rows gauge",
+            *(series("stage_rows", record["rows"], stage=stage) for stage, record in metrics["stages"].items()),
+            f"# HELP {METRICS_PREFIX}_stage_rows_per_second Throughput of each pipeline stage in the last run.",
+            f"# TYPE {METRICS_PREFIX}_stage_rows_per_second gauge",
+            *(
+                series("stage_rows_per_second", record["rows_per_second"], stage=stage)
+                for stage, record in metrics["stages"].items() if record["rows_per_second"] is not None
+            ),
+            f"# HELP {METRICS_PREFIX}_request_latency_seconds Latency of the form submissions of the last run by outcome.",
+            f"# TYPE {METRICS_PREFIX}_request_latency_seconds histogram",
+        ]
+        for outcome, histogram in metrics["request_latency_seconds"].items():
+            for bound, count in histogram["buckets"].items():
+                lines.append(series("request_latency_seconds_bucket", count, outcome=outcome, le=bound))
+            lines.append(series("request_latency_seconds_sum", histogram["sum"], outcome=outcome))
+            lines.append(series("request_latency_seconds_count", histogram["count"], outcome=outcome))
+        for name, value in metrics["counters"].items():
+            lines += [f"# TYPE {METRICS_PREFIX}_{name} gauge", series(name, value)]
+        lines += [
+            f"# HELP {METRICS_PREFIX}_last_run_timestamp_seconds Time the metrics of the last run were written.",
+            f"# TYPE {METRICS_PREFIX}_last_run_timestamp_seconds gauge",
+            series("last_run_timestamp_seconds", round(time.time(), 3)),
+        ]
+        return "\n".join(lines) + "\n"
+
+# Metrics of the current run, shared by all modules
+current_metrics = RunMetrics()
+
+def reset_metrics(labels=None):
+    """
+    Starts a new set of metrics for the next run.
+    """
+    global current_metrics
+    current_metrics = RunMetrics(labels)
+    return current_metrics
+
+def add_stage_time(stage, seconds):
+    """
+    Adds wall time to a stage of the current run (e.g. work done in a background thread).
+    """
+    current_metrics.add_stage_time(stage, seconds)
+
+def add_stage_rows(stage, rows):
+    """
+    Adds processed rows to a stage of the current run.
+    """
+    current_metrics.add_stage_rows(stage, rows)
+
+def set_counter(name, value):
+    """
+    Sets a counter of the current run.
+    """
+    current_metrics.set_counter(name, value)
+
+def observe_request(outcome, seconds):
+    """
+    Records the latency and outcome of one form POST of the current run.
+    """
+    current_metrics.observe_request(outcome, seconds)
+
+def timed_stage(stage):
+    """
+    Decorator that adds the wall time of every call of the function to `stage`.
+    With profiling enabled (stage_profiling.py), the call also runs under cProfile and tracemalloc.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                if is_profiling():
+                    return run_profiled(stage, function, args, kwargs, current_metrics.labels)
+                return function(*args, **kwargs)
+            finally:
+                current_metrics.add_stage_time(stage, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+def write_atomically(path, text):
+    """
+    Writes `text` next to `path` and swaps it in, so collectors never read a partial file.
+    """
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "w", encoding="utf-8") as metrics_file:
+        metrics_file.write(text)
+    os.replace(temporary_path, path)
+
+def export_metrics(name=METRICS_NAME, directory=None):
+    """
+    Writes the metrics of the current run to _logs/<name>.json and, for the Prometheus
+    textfile collector, _logs/<name>.prom (or to `directory` instead of _logs).
+    Returns True if both files were written, otherwise False.
+    """
+    try:
+        directory = directory or METRICS_DIRECTORY
+        os.makedirs(directory, exist_ok=True)
+        json_path = os.path.join(directory, f"{name}.json")
+        write_atomically(json_path, json.dumps(current_metrics.to_dict(), indent=2))
+        write_atomically(os.path.join(directory, f"{name}.prom"), current_metrics.to_prometheus())
+        logging.info(f"Run metrics written to: {json_path}")
+        return True
+    except Exception as e:
+        logging.error(f"Error writing the run metrics: {str(e)}", exc_info=True)
+        return False
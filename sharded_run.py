@@ -0,0 +1,232 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import google_forms_submission
+from input_loader import load_input_data
+from input_file_processment import validate_worktray
+from google_forms_submission import (
+    MAX_REQUESTS_PER_SECOND, submit_to_google_forms, clear_submission_journal, apply_journal_entry, show_results_popup
+)
+from run_metrics import reset_metrics, export_metrics, timed_stage, add_stage_rows, set_counter
+from queued_logging import configure_queued_logging, stop_queued_logging
+from stage_profiling import PROFILE_ARGUMENT_HELP, set_profiling
+from submission_journal import SubmissionJournal, journal_path_for
+from worktray_creation import build_worktray_rows
+from form_plan import load_form_plan
+from work_items import work_items
+from status_index import StatusIndex, status_index_path_for, clear_status_index
+from worktray_storage import XlsxWorktrayStorage
+from worktray_stream import load_template_layout, create_write_only_worktray, atomic_save
+
+# Configurable parameters
+LOGS_DIRECTORY = "_logs"  # Directory to store logs
+LOGS_FILE = os.path.join(LOGS_DIRECTORY, "sharded_run.log")  # Log file path
+INPUT_DIRECTORY = "input"
+INPUT_FILE = "input_file.xlsx"
+PROCESS_DATA_DIRECTORY = "process_data"
+WORKTRAY_FILE = "worktray.xlsx"
+SHARDS_DIRECTORY = os.path.join(PROCESS_DATA_DIRECTORY, "shards")  # Per-shard worktrays and journals
+SHARD_COUNT = os.cpu_count() or 1  # Number of shards (worker processes)
+# Settings of google_forms_submission copied from this process into every shard, so values changed at runtime
+# (not only in the file) apply there too; every other setting is read again by the shard from its module file
+SHARD_SETTINGS = (
+    "GOOGLE_FORM_URL", "SUBMISSION_WORKERS", "HTTP_POOL_SIZE", "REQUEST_TIMEOUT", "MAX_RETRIES", "RETRY_BACKOFF_BASE",
+    "RETRY_BACKOFF_MAX", "RETRY_STATUS_CODES", "CHECKPOINT_INTERVAL", "SKIP_PREVIOUSLY_SUBMITTED", "ROW_LOG_POLICY", "ROW_LOG_SAMPLE_EVERY",
+)
+
+def configure_logging():
+    """
+    Configures logging for the application.
+    """
+    if not os.path.exists(LOGS_DIRECTORY):
+        os.makedirs(LOGS_DIRECTORY)
+
+    # Clear any existing logging configuration; records are written to the file by a background thread
+    configure_queued_logging(LOGS_FILE)
+    logging.info("Logging configured successfully.")
+
+def shard_worktray_path(shard_index):
+    """
+    Returns the path of the worktray of a shard.
+    """
+    return os.path.join(SHARDS_DIRECTORY, f"worktray_shard_{shard_index}.xlsx")
+
+def shard_ranges(total_rows, shards):
+    """
+    Splits `total_rows` rows into `shards` contiguous (start, stop) ranges of nearly equal size.
+    """
+    shards = max(1, min(shards, total_rows))
+    size, remainder = divmod(total_rows, shards)
+    ranges = []
+    start = 0
+    for shard_index in range(shards):
+        stop = start + size + (1 if shard_index < remainder else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+def shard_settings():
+    """
+    Returns the current values of the SHARD_SETTINGS of google_forms_submission, to be passed to the shards.
+    """
+    return {name: getattr(google_forms_submission, name) for name in SHARD_SETTINGS}
+
+def run_shard(shard_index, requests_per_second, settings=None):
+    """
+    Validates and submits the worktray of a shard. Runs in its own process with its own log file.
+    `settings` (from shard_settings in the parent) replace the submission settings the shard process
+    imported. Adaptive control is off in shards, so each keeps its fixed share of the global rate cap.
+    Exits with status 0 if both steps succeeded, otherwise 1.
+    """
+    for name, value in (settings or {}).items():
+        setattr(google_forms_submission, name, value)
+    configure_queued_logging(os.path.join(LOGS_DIRECTORY, f"shard_{shard_index}.log"))
+    worktray_path = shard_worktray_path(shard_index)
+    logging.info(f"---- Starting shard {shard_index}: {worktray_path} ----")
+    reset_metrics({"shard": str(shard_index)})
+
+    storage = XlsxWorktrayStorage(worktray_path)
+    try:
+        success = (
+            validate_worktray(storage=storage)
+            and submit_to_google_forms(
+                workers=google_forms_submission.SUBMISSION_WORKERS, requests_per_second=requests_per_second,
+                pool_size=google_forms_submission.HTTP_POOL_SIZE, checkpoint_interval=google_forms_submission.CHECKPOINT_INTERVAL,
+                storage=storage, show_results=False, skip_submitted=google_forms_submission.SKIP_PREVIOUSLY_SUBMITTED, adaptive=False
+            )
+        )
+    finally:
+        storage.commit()
+        storage.close()
+    if success:
+        clear_submission_journal(worktray_path)
+    export_metrics(f"metrics_shard_{shard_index}")
+    logging.info(f"Shard {shard_index} finished. Success: {success}")
+    stop_queued_logging()
+    raise SystemExit(0 if success else 1)
+
+def merge_shards(shard_rows):
+    """
+    Reassembles process_data/worktray.xlsx from the shard worktrays in the original row order.
+    Outcomes left in the journal of a crashed shard are applied, and a shard without a worktray
+    keeps the rows it was given (`shard_rows[shard_index]`).
+    The status index of the merged worktray is written along the way.
+    Returns a tuple (success_count, failure_count) computed like submit_to_google_forms does.
+    """
+    plan = load_form_plan()
+    success_count = 0
+    failure_count = 0
+    merged_path = os.path.join(PROCESS_DATA_DIRECTORY, WORKTRAY_FILE)
+    clear_status_index(merged_path)
+    status_index = StatusIndex(status_index_path_for(merged_path))
+    merged_row = 1  # Header row
+    worktray_wb, worktray_ws = create_write_only_worktray(load_template_layout())
+    for shard_index, rows in enumerate(shard_rows):
+        worktray_path = shard_worktray_path(shard_index)
+        if os.path.exists(worktray_path):
+            rows = XlsxWorktrayStorage(worktray_path, plan=plan).read_rows()
+        else:
+            logging.error(f"Shard {shard_index} has no worktray; its rows are kept as PENDING.")
+            rows = enumerate(rows, start=2)
+        journal_entries = SubmissionJournal(journal_path_for(worktray_path)).load()
+        shard_status_path = status_index_path_for(worktray_path)
+        shard_status = StatusIndex(shard_status_path) if os.path.exists(shard_status_path) else None
+        for item in work_items(rows, plan):
+            if item.row in journal_entries:
+                apply_journal_entry(item, journal_entries[item.row])
+            if item.attempts is None and shard_status is not None:
+                item.attempts, item.backoff_time = shard_status.submission_stats(item.row)  # Kept by the shard's status index
+            worktray_ws.append(item.values())
+            merged_row += 1
+            item.row = merged_row  # Row in the merged worktray
+            status_index.record_item(item)
+            if item.submitted == True:
+                success_count += 1
+            else:
+                failure_count += 1
+        if shard_status is not None:
+            shard_status.close()
+    atomic_save(worktray_wb, merged_path)
+    status_index.close()
+    logging.info(f"Merged worktray saved to: {merged_path}")
+    return success_count, failure_count
+
+@timed_stage("sharded_run")
+def run_sharded(shards=SHARD_COUNT, requests_per_second=None, show_results=True):
+    """
+    Runs validation and submission in `shards` worker processes, each on its own worktray holding a
+    contiguous range of the input rows, then merges the shard worktrays into process_data/worktray.xlsx.
+    The global requests-per-second cap is divided among the shards. A shard that fails or crashes does
+    not stop the others; its journal lets the next run resume it.
+    Each shard writes its own metrics to _logs/metrics_shard_<n>.json and .prom.
+    Returns True if every shard succeeded, otherwise False.
+    """
+    try:
+        input_file_path = os.path.join(INPUT_DIRECTORY, INPUT_FILE)
+        input_data = load_input_data(input_file_path)
+        plan = load_form_plan()
+        if not all(column in input_data.columns for column in plan.data_columns):
+            logging.error("The input file is missing required columns.")
+            return False
+
+        # Write one worktray per shard from the single parse of the input file
+        os.makedirs(SHARDS_DIRECTORY, exist_ok=True)
+        rows = build_worktray_rows(input_data, plan)
+        add_stage_rows("sharded_run", len(rows))
+        ranges = shard_ranges(len(rows), shards)
+        shard_rows = [rows[start:stop] for start, stop in ranges]
+        for shard_index, shard in enumerate(shard_rows):
+            XlsxWorktrayStorage(shard_worktray_path(shard_index), plan=plan).write_rows(shard)
+            clear_status_index(shard_worktray_path(shard_index))
+        logging.info(f"Input split into {len(ranges)} shards: {ranges}")
+
+        # Run every shard in its own process
+        if requests_per_second is None:
+            requests_per_second = MAX_REQUESTS_PER_SECOND
+        shard_rate = requests_per_second / len(ranges) if requests_per_second else 0
+        context = multiprocessing.get_context("spawn")
+        processes = [
+            context.Process(target=run_shard, args=(shard_index, shard_rate, shard_settings()), name=f"shard-{shard_index}")
+            for shard_index in range(len(ranges))
+        ]
+        for process in processes:
+            process.start()
+        failed_shards = []
+        for shard_index, process in enumerate(processes):
+            process.join()
+            if process.exitcode != 0:
+                failed_shards.append(shard_index)
+                logging.error(f"Shard {shard_index} failed with exit code {process.exitcode}. Check _logs/shard_{shard_index}.log")
+
+        # Reassemble the worktray in the original order
+        success_count, failure_count = merge_shards(shard_rows)
+        set_counter("rows_submitted", success_count)
+        set_counter("rows_not_submitted", failure_count)
+        logging.info(f"Sharded run finished. Rows submitted: {success_count}, rows not submitted: {failure_count}, failed shards: {failed_shards}")
+
+        if show_results:
+            show_results_popup(success_count, failure_count)
+
+        return not failed_shards
+
+    except Exception as e:
+        logging.error(f"Error during the sharded run: {str(e)}", exc_info=True)
+        return False
+
+# Execute the function if the script is run directly
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate and submit the worktray in several worker processes.")
+    parser.add_argument("--profile", action="store_true", help=PROFILE_ARGUMENT_HELP)
+    if parser.parse_args().profile:
+        set_profiling()
+
+    configure_logging()
+    logging.info("---- Starting module 'sharded_run' ----")
+    success = run_sharded()
+    export_metrics()
+
+    if not success:
+        logging.error("Sharded run failed. Check the logs for details.")
+    else:
+        logging.info("Sharded run completed successfully.")
@@ -0,0 +1,97 @@
+import cProfile
+import logging
+import os
+import threading
+import tracemalloc
+
+# Configurable parameters
+PROFILE_ENVIRONMENT_VARIABLE = "FORMS_AUTOMATION_PROFILE"  # Set to 1, true or yes to profile every stage
+PROFILE_MODE = os.environ.get(PROFILE_ENVIRONMENT_VARIABLE, "").strip().lower() in ("1", "true", "yes")
+PROFILE_DIRECTORY = "_logs"  # Directory where the profiles are written
+PROFILE_TOP_ALLOCATIONS = 25  # Source lines listed in each allocation report
+PROFILE_TRACEBACK_FRAMES = 1  # Frames kept by tracemalloc for each allocation (more frames cost more memory)
+PROFILE_ARGUMENT_HELP = f"Profile each stage with cProfile and tracemalloc into _logs (also enabled by {PROFILE_ENVIRONMENT_VARIABLE}=1)"
+
+# Only one stage is profiled at a time (cProfile cannot nest profilers)
+profile_lock = threading.Lock()
+
+def is_profiling():
+    """
+    Tells whether the pipeline stages are run under the profilers.
+    """
+    return PROFILE_MODE
+
+def set_profiling(enabled=True):
+    """
+    Enables or disables stage profiling for this process and the worker processes it starts.
+    """
+    global PROFILE_MODE
+    PROFILE_MODE = enabled
+    os.environ[PROFILE_ENVIRONMENT_VARIABLE] = "1" if enabled else "0"
+
+def profile_name(stage, labels=None):
+    """
+    Returns the base name of the profile files of a stage, e.g. profile_validate or profile_submit_shard_1.
+    """
+    suffix = "".join(f"_{key}_{value}" for key, value in (labels or {}).items())
+    return f"profile_{stage}{suffix}"
+
+def take_snapshot():
+    """
+    Takes a tracemalloc snapshot without the allocations of the profilers and of the import system.
+    """
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, cProfile.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ))
+
+def write_allocation_report(path, stage, before, after, peak, top=PROFILE_TOP_ALLOCATIONS):
+    """
+    Writes the peak traced memory of a stage and the `top` source lines whose memory grew the most
+    between the `before` and `after` snapshots.
+    """
+    differences = after.compare_to(before, "lineno")
+    with open(path, "w", encoding="utf-8") as report:
+        report.write(f"Stage: {stage}\n")
+        report.write(f"Peak traced memory: {peak / 1024 / 1024:.1f} MiB\n")
+        report.write(f"Memory growth over the stage: {sum(stat.size_diff for stat in differences) / 1024 / 1024:.1f} MiB\n\n")
+        report.write(f"Top {top} source lines by memory growth:\n")
+        for position, stat in enumerate(differences[:top], start=1):
+            frame = stat.traceback[0]
+            report.write(f"{position:3}. {frame.filename}:{frame.lineno}: {stat.size_diff / 1024:+.1f} KiB ({stat.size / 1024:.1f} KiB in {stat.count} blocks)\n")
+
+def run_profiled(stage, function, args, kwargs, labels=None):
+    """
+    Runs `function` under cProfile and tracemalloc and writes _logs/profile_<stage>.pstats (open it with
+    pstats or snakeviz) and _logs/profile_<stage>_allocations.txt. cProfile only sees the calling thread;
+    tracemalloc counts the allocations of every thread. A stage started while another one is being
+    profiled runs unprofiled.
+    """
+    if not profile_lock.acquire(blocking=False):
+        return function(*args, **kwargs)
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(PROFILE_TRACEBACK_FRAMES)
+    before = take_snapshot()
+    tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profiler.disable()
+            try:
+                name = profile_name(stage, labels)
+                os.makedirs(PROFILE_DIRECTORY, exist_ok=True)
+                profiler.dump_stats(os.path.join(PROFILE_DIRECTORY, f"{name}.pstats"))
+                _, peak = tracemalloc.get_traced_memory()
+                write_allocation_report(os.path.join(PROFILE_DIRECTORY, f"{name}_allocations.txt"), stage, before, take_snapshot(), peak)
+                logging.info(f"Profile of stage '{stage}' written to: {os.path.join(PROFILE_DIRECTORY, name)}.pstats")
+            except Exception as e:
+                logging.error(f"Error writing the profile of stage '{stage}': {str(e)}", exc_info=True)
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+        profile_lock.release()
@@ -0,0 +1,144 @@
+import os
+import sqlite3
+from circuit_breaker import DEFERRED_MESSAGE
+
+# Configurable parameters
+STATUS_INDEX_SUFFIX = ".status.sqlite"  # Suffix added to the worktray path to name its status index
+STATUS_BATCH_SIZE = 1000  # Status changes buffered before they are written to the index
+
+# Row statuses
+STATUS_PENDING = "pending"  # Valid, not submitted yet
+STATUS_INVALID = "invalid"  # "Datos correctos" is FALSE
+STATUS_SUBMITTED = "submitted"  # Accepted by the form
+STATUS_FAILED = "failed"  # Submission failed; the reason is the "Observaciones" text
+STATUS_DEFERRED = "deferred"  # Not sent because the form endpoint was unreachable (circuit breaker)
+
+def status_index_path_for(worktray_path):
+    """
+    Returns the path of the status index that belongs to the given worktray.
+    """
+    return os.path.splitext(worktray_path)[0] + STATUS_INDEX_SUFFIX
+
+def clear_status_index(worktray_path):
+    """
+    Removes the status index of a worktray (e.g. because the worktray was created again).
+    """
+    index_path = status_index_path_for(worktray_path)
+    for path in (index_path, index_path + "-wal", index_path + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+
+def status_of(item):
+    """
+    Returns the status of a work item from its "Datos correctos" and "Ingreso exitoso a Forms" flags.
+    """
+    if item.valid != True:
+        return STATUS_INVALID
+    if item.submitted == True:
+        return STATUS_SUBMITTED
+    if item.submitted in (None, "", "PENDING"):
+        return STATUS_DEFERRED if item.observation_text == DEFERRED_MESSAGE else STATUS_PENDING
+    return STATUS_FAILED
+
+class StatusIndex:
+    """
+    Sidecar SQLite index of the worktray row numbers by status (pending, invalid, submitted, deferred, failed
+    with its reason), kept up to date by validation and submission. It lets a retry go straight to the failed
+    rows instead of reading the whole worktray.
+    Each submitted row also keeps the requests sent and the seconds spent in backoff by its last submission,
+    which a later status change without a submission (e.g. validating again) does not erase.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS status (row INTEGER PRIMARY KEY, status TEXT NOT NULL, reason TEXT, attempts INTEGER, backoff_seconds REAL)"
+        )
+        columns = [column[1] for column in self.connection.execute("PRAGMA table_info(status)")]
+        for column, column_type in (("attempts", "INTEGER"), ("backoff_seconds", "REAL")):
+            if column not in columns:  # Index written before the column existed
+                self.connection.execute(f"ALTER TABLE status ADD COLUMN {column} {column_type}")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS status_rows ON status (status, row)")
+        self.connection.commit()
+        self.changes = []
+
+    def record(self, worktray_row, status, reason=None, attempts=None, backoff_time=None):
+        """
+        Sets the status of a row and, if it was submitted, its requests sent and seconds spent in backoff.
+        Changes are written in batches of STATUS_BATCH_SIZE.
+        """
+        self.changes.append((worktray_row, status, reason, attempts, backoff_time))
+        if len(self.changes) >= STATUS_BATCH_SIZE:
+            self.flush()
+
+    def record_item(self, item):
+        """
+        Sets the status of a row from its work item; failed and invalid rows keep their observation as reason.
+        """
+        status = status_of(item)
+        self.record(
+            item.row, status, item.observation_text if status in (STATUS_FAILED, STATUS_INVALID) else None,
+            item.attempts, item.backoff_time
+        )
+
+    def flush(self):
+        """
+        Writes the buffered status changes.
+        """
+        if self.changes:
+            self.connection.executemany(
+                "INSERT INTO status VALUES (?, ?, ?, ?, ?) ON CONFLICT (row) DO UPDATE SET status = excluded.status, reason = excluded.reason, "
+                "attempts = COALESCE(excluded.attempts, attempts), backoff_seconds = COALESCE(excluded.backoff_seconds, backoff_seconds)",
+                self.changes
+            )
+            self.changes = []
+
+    def rows_with(self, status):
+        """
+        Returns the list of (worktray row, reason) with the given status, in row order.
+        """
+        self.flush()
+        return self.connection.execute(
+            "SELECT row, reason FROM status WHERE status = ? ORDER BY row", (status,)
+        ).fetchall()
+
+    def submission_stats(self, worktray_row):
+        """
+        Returns (requests sent, seconds spent in backoff) of the last submission of a row, or (None, None)
+        if it was never submitted.
+        """
+        self.flush()
+        stats = self.connection.execute(
+            "SELECT attempts, backoff_seconds FROM status WHERE row = ?", (worktray_row,)
+        ).fetchone()
+        return stats or (None, None)
+
+    def counts(self):
+        """
+        Returns a dict {status: number of rows}.
+        """
+        self.flush()
+        return dict(self.connection.execute("SELECT status, COUNT(*) FROM status GROUP BY status").fetchall())
+
+    def is_empty(self):
+        """
+        Tells whether the index holds no rows (e.g. the worktray was validated before the index existed).
+        """
+        self.flush()
+        return self.connection.execute("SELECT 1 FROM status LIMIT 1").fetchone() is None
+
+    def commit(self):
+        """
+        Makes the recorded statuses durable.
+        """
+        self.flush()
+        self.connection.commit()
+
+    def close(self):
+        """
+        Commits and closes the index.
+        """
+        self.commit()
+        self.connection.close()
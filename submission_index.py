@@ -0,0 +1,89 @@
+import hashlib
+import logging
+import os
+import sqlite3
+from datetime import date, datetime, time, timedelta
+
+# Configurable parameters
+PROCESS_DATA_DIRECTORY = "process_data"
+SUBMISSION_INDEX_FILE = "submission_index.sqlite"  # Rows accepted by the form in any run
+INDEX_COMMIT_INTERVAL = 100  # Rows added between commits (the journal covers the rows not committed yet)
+
+def canonical_value(value):
+    """
+    Returns a stable text form of a cell value, so the same data read in different runs
+    (e.g. 1500 and 1500.0) hashes the same.
+    """
+    if hasattr(value, "item") and not isinstance(value, (str, bytes)):
+        value = value.item()  # NumPy scalars
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return str(value.total_seconds())
+    if isinstance(value, str):
+        return value.strip()
+    return repr(value)
+
+def content_hash(values):
+    """
+    Returns the SHA-256 hash of the data values of a row (e.g. Nombre, Producto, Monto, Fecha de Solicitud).
+    """
+    text = "\x1f".join(canonical_value(value) for value in values)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class SubmissionIndex:
+    """
+    Persistent set of the content hashes of the rows accepted by the form, shared by all runs
+    (and by the shards of a sharded run). Not thread-safe: use it from the thread that
+    writes the results back to the worktray.
+    contains only answers for the rows recorded before the index was opened, so a row repeated within
+    the run it was accepted in is posted again rather than taken for a previous submission.
+    """
+    def __init__(self, path=None):
+        self.path = path or os.path.join(PROCESS_DATA_DIRECTORY, SUBMISSION_INDEX_FILE)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(self.path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS submitted (hash TEXT PRIMARY KEY, submitted_at TEXT)")
+        self.connection.commit()
+        self.pending = 0
+        # Rows recorded from now on get higher rowids (INSERT OR IGNORE keeps the rowid of a known hash)
+        self.previous_runs_rowid = self.connection.execute("SELECT COALESCE(MAX(rowid), 0) FROM submitted").fetchone()[0]
+
+    def contains(self, values):
+        """
+        Tells whether a row with the same data values was accepted by the form in a previous run.
+        """
+        return self.connection.execute(
+            "SELECT 1 FROM submitted WHERE hash = ? AND rowid <= ?", (content_hash(values), self.previous_runs_rowid)
+        ).fetchone() is not None
+
+    def add(self, values):
+        """
+        Records that the form accepted the row with these data values.
+        """
+        self.connection.execute(
+            "INSERT OR IGNORE INTO submitted VALUES (?, ?)",
+            (content_hash(values), datetime.now().isoformat(timespec="seconds"))
+        )
+        self.pending += 1
+        if self.pending >= INDEX_COMMIT_INTERVAL:
+            self.commit()
+
+    def commit(self):
+        """
+        Makes the added rows durable.
+        """
+        self.connection.commit()
+        self.pending = 0
+
+    def close(self):
+        """
+        Commits and closes the index.
+        """
+        self.commit()
+        self.connection.close()
+        logging.info(f"Submission index saved to: {self.path}")
@@ -0,0 +1,85 @@
+import json
+import logging
+import os
+import threading
+
+# Configurable parameters
+JOURNAL_SUFFIX = ".journal.jsonl"  # Suffix added to the worktray path to name its journal
+
+def journal_path_for(worktray_path):
+    """
+    Returns the path of the journal that belongs to the given worktray.
+    """
+    return os.path.splitext(worktray_path)[0] + JOURNAL_SUFFIX
+
+def row_key(values):
+    """
+    Returns a key identifying the data values of a row (e.g. Nombre, Producto, Monto, Fecha de Solicitud).
+    Used to ignore journal entries that no longer match the worktray (e.g. it was recreated).
+    """
+    return [str(value) for value in values]
+
+class SubmissionJournal:
+    """
+    Append-only JSONL journal with the outcome of each submitted row.
+    Every entry is flushed and synced to disk as soon as it is written, so the
+    progress survives a crash without re-saving the whole worktray.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = None
+
+    def load(self):
+        """
+        Reads the journal and returns a dict {worktray row: entry} with the last entry of each row.
+        A partially written last line (e.g. after a crash) is ignored.
+        """
+        entries = {}
+        if not os.path.exists(self.path):
+            return entries
+        with open(self.path, "r", encoding="utf-8") as journal_file:
+            for line in journal_file:
+                try:
+                    entry = json.loads(line)
+                    entries[entry["row"]] = entry
+                except (ValueError, KeyError, TypeError):
+                    logging.warning(f"Ignoring corrupt journal line in {self.path}: {line!r}")
+        return entries
+
+    def append(self, row, values, success, observation, attempts=None, backoff_time=None):
+        """
+        Records the outcome of a row, with the requests sent and the seconds spent in backoff,
+        and makes it durable before returning.
+        """
+        entry = json.dumps({
+            "row": row,
+            "key": row_key(values),
+            "success": success,
+            "observation": observation,
+            "attempts": attempts,
+            "backoff_time": backoff_time,
+        }, ensure_ascii=False)
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.path, "a", encoding="utf-8")
+            self.file.write(entry + "\n")
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        """
+        Closes the journal file.
+        """
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def clear(self):
+        """
+        Removes the journal once all its entries are safely stored in the worktray.
+        """
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
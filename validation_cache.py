@@ -0,0 +1,151 @@
+import hashlib
+import logging
+import os
+import tempfile
+import numpy as np
+
+# Configurable parameters
+PROCESS_DATA_DIRECTORY = "process_data"
+VALIDATION_CACHE_FILE = "validation_cache.npz"  # Validation results of the rows seen in previous runs
+VALIDATION_CACHE_MAX_ROWS = 500000  # Rows kept in the cache (about 25 bytes each); the least recently used are evicted beyond this
+VALIDATION_LOGIC_VERSION = 1  # Raise when the validation code changes in a way the form schema does not show (clears the cache)
+KEY_DTYPE = "S16"  # Row keys are 128-bit hashes
+
+def validation_key(values):
+    """
+    Returns the key of the data values of a row for the validation cache. Unlike the submission index hash,
+    it keeps the exact type and value of each cell (the number 1500 and the text "1500", or " Ana" and "Ana",
+    do not validate the same), so a cached result is the one validation would compute.
+    """
+    return hashlib.blake2b(repr(tuple(values)).encode("utf-8"), digest_size=16).digest()
+
+class ValidationCache:
+    """
+    Persistent cache of the validation result ("Datos correctos" and "Observaciones") of each distinct row,
+    keyed by validation_key. It is loaded in full when opened and written back when closed, as sorted NumPy
+    arrays (keys, valid flags, observation codes and the run that last used each row) plus the table of
+    observation texts, so a lookup is a vectorized binary search instead of a query per row.
+    The cache is tied to the validation fingerprint of the form plan and to VALIDATION_LOGIC_VERSION: when
+    either changes, it starts empty. Closing it evicts the least recently used rows beyond `max_rows`.
+    Processes closing the same cache at once (shards) keep the rows of the last one to close; the others
+    are validated again by the next run.
+    """
+    def __init__(self, fingerprint, path=None, max_rows=VALIDATION_CACHE_MAX_ROWS):
+        self.path = path or os.path.join(PROCESS_DATA_DIRECTORY, VALIDATION_CACHE_FILE)
+        self.fingerprint = f"{fingerprint}:{VALIDATION_LOGIC_VERSION}"
+        self.max_rows = max_rows
+        self.keys = np.empty(0, dtype=KEY_DTYPE)
+        self.valid = np.empty(0, dtype=bool)
+        self.codes = np.empty(0, dtype=np.int32)
+        self.last_run = np.empty(0, dtype=np.int64)
+        self.texts = []
+        self.run = 1
+        self.load()
+        self.text_codes = {text: code for code, text in enumerate(self.texts)}
+        self.new_results = {}  # {key: (valid, observation code)} of the rows validated in this run
+        self.hits = 0
+        self.misses = 0
+
+    def load(self):
+        """
+        Reads the cache file, unless it is missing, unreadable or was built with other validation rules.
+        """
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as stored:
+                self.run = int(stored["run"]) + 1
+                if stored["fingerprint"].item() != self.fingerprint:
+                    logging.info("Validation rules or messages changed; the validation cache starts empty.")
+                    return
+                self.keys = stored["keys"]
+                self.valid = stored["valid"]
+                self.codes = stored["codes"]
+                self.last_run = stored["last_run"]
+                self.texts = stored["texts"].tolist()
+            logging.info(f"Validation cache loaded with {len(self.keys)} rows from: {self.path}")
+        except Exception as e:
+            logging.warning(f"Ignoring the unreadable validation cache {self.path}: {str(e)}")
+
+    def lookup(self, keys):
+        """
+        Returns a list with the cached (valid, observation text) of each key, or None for the keys not cached,
+        marking the cached rows as used by this run.
+        """
+        results = [None] * len(keys)
+        if len(self.keys):
+            wanted = np.array(keys, dtype=KEY_DTYPE)
+            positions = np.minimum(np.searchsorted(self.keys, wanted), len(self.keys) - 1)
+            found = self.keys[positions] == wanted
+            positions = positions[found]
+            self.last_run[positions] = self.run
+            for index, valid, code in zip(np.flatnonzero(found).tolist(), self.valid[positions].tolist(), self.codes[positions].tolist()):
+                results[index] = (valid, self.texts[code])
+        if self.new_results:
+            for index, key in enumerate(keys):
+                if results[index] is None and key in self.new_results:
+                    valid, code = self.new_results[key]
+                    results[index] = (valid, self.texts[code])
+        hits = len(keys) - results.count(None)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return results
+
+    def store(self, results):
+        """
+        Adds the results of newly validated rows, given as (key, valid, observation text).
+        """
+        for key, valid, text in results:
+            code = self.text_codes.get(text)
+            if code is None:
+                code = self.text_codes[text] = len(self.texts)
+                self.texts.append(text)
+            self.new_results[key] = (valid, code)
+
+    def save(self):
+        """
+        Writes the cache with the rows added by this run, keeping the `max_rows` most recently used.
+        """
+        keys, valid, codes, last_run = self.keys, self.valid, self.codes, self.last_run
+        if self.new_results:
+            new_valid, new_codes = zip(*self.new_results.values())
+            keys = np.concatenate((keys, np.array(list(self.new_results), dtype=KEY_DTYPE)))
+            valid = np.concatenate((valid, np.array(new_valid, dtype=bool)))
+            codes = np.concatenate((codes, np.array(new_codes, dtype=np.int32)))
+            last_run = np.concatenate((last_run, np.full(len(new_codes), self.run, dtype=np.int64)))
+
+        if len(keys) > self.max_rows:
+            logging.info(f"Evicting {len(keys) - self.max_rows} least recently used rows from the validation cache")
+            kept = np.argsort(last_run, kind="stable")[len(keys) - self.max_rows:]
+            keys, valid, codes, last_run = keys[kept], valid[kept], codes[kept], last_run[kept]
+        order = np.argsort(keys, kind="stable")
+        keys, valid, codes, last_run = keys[order], valid[order], codes[order], last_run[order]
+
+        # Keep only the observation texts still in use
+        used, codes = np.unique(codes, return_inverse=True)
+        texts = [self.texts[code] for code in used.tolist()]
+
+        # Each process writes its own temporary file, so shards saving at once do not replace each other's
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(self.path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as cache_file:
+                np.savez(
+                    cache_file, keys=keys, valid=valid, codes=codes.astype(np.int32), last_run=last_run,
+                    texts=np.array(texts, dtype=str), fingerprint=np.array(self.fingerprint), run=np.array(self.run)
+                )
+            os.replace(temporary_path, self.path)
+        except Exception:
+            os.remove(temporary_path)
+            raise
+
+    def close(self):
+        """
+        Saves the cache. An error saving it is logged, not raised: the next run validates those rows again.
+        """
+        try:
+            self.save()
+            logging.info(f"Validation cache: {self.hits} rows reused, {self.misses} rows validated; saved to: {self.path}")
+        except Exception as e:
+            logging.error(f"Error saving the validation cache {self.path}: {str(e)}", exc_info=True)
@@ -0,0 +1,166 @@
+import argparse
+import logging
+import os
+import shutil
+import time
+from datetime import datetime
+from input_validation import validate_input_file
+from input_loader import clear_input_cache
+from worktray_creation import create_worktray
+from input_file_processment import validate_worktray
+from google_forms_submission import submit_to_google_forms, clear_submission_journal, get_http_session
+from worktray_storage import XlsxWorktrayStorage, WORKTRAY_FILE
+from worktray_stream import load_template_layout
+from run_metrics import reset_metrics, export_metrics
+from queued_logging import configure_queued_logging
+from headless import set_headless
+from stage_profiling import PROFILE_ARGUMENT_HELP, set_profiling
+
+# Configurable parameters
+LOGS_DIRECTORY = "_logs"  # Directory to store logs
+LOGS_FILE = os.path.join(LOGS_DIRECTORY, "watch_folder.log")  # Log file of the daemon itself
+INBOX_DIRECTORY = "inbox"  # Directory watched for new input workbooks
+PROCESSED_DIRECTORY = os.path.join(INBOX_DIRECTORY, "processed")  # Input files whose run succeeded
+FAILED_DIRECTORY = os.path.join(INBOX_DIRECTORY, "failed")  # Input files whose run failed
+RUNS_DIRECTORY = os.path.join("process_data", "runs")  # One directory per input file with its worktray, log and metrics
+RUN_LOG_FILE = "run.log"  # Log file of each run, inside its run directory
+POLL_INTERVAL = 5  # Seconds between scans of the inbox
+SETTLE_TIME = 2  # Seconds a file must stay unchanged before it is processed (so half-copied files are skipped)
+
+def configure_logging():
+    """
+    Configures logging for the application.
+    """
+    if not os.path.exists(LOGS_DIRECTORY):
+        os.makedirs(LOGS_DIRECTORY)
+
+    # Clear any existing logging configuration; records are written to the file by a background thread
+    configure_queued_logging(LOGS_FILE)
+    logging.info("Logging configured successfully.")
+
+def warm_up():
+    """
+    Loads what every run needs once for the life of the daemon: the worktray template layout
+    and the shared HTTP session (whose connections then stay open between files).
+    """
+    load_template_layout()
+    get_http_session()
+    logging.info("Template layout and HTTP session ready.")
+
+def pending_files():
+    """
+    Returns the Excel files in the inbox that have not changed for SETTLE_TIME seconds, oldest first.
+    Excel lock files (~$...) are ignored.
+    """
+    if not os.path.isdir(INBOX_DIRECTORY):
+        return []
+    now = time.time()
+    files = []
+    for entry in os.scandir(INBOX_DIRECTORY):
+        if entry.is_file() and entry.name.lower().endswith(".xlsx") and not entry.name.startswith("~$"):
+            mtime = entry.stat().st_mtime
+            if now - mtime >= SETTLE_TIME:
+                files.append((mtime, entry.path))
+    return [path for _, path in sorted(files)]
+
+def run_directory_for(input_path):
+    """
+    Returns the run directory of an input file, named after the file and its modification time.
+    The name does not change if the daemon restarts, so an interrupted run resumes from its journal.
+    """
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    stamp = datetime.fromtimestamp(os.stat(input_path).st_mtime).strftime("%Y%m%d_%H%M%S")
+    return os.path.join(RUNS_DIRECTORY, f"{stem}_{stamp}")
+
+def move_to(input_path, directory):
+    """
+    Moves a processed input file out of the inbox, keeping the existing files in `directory`.
+    """
+    os.makedirs(directory, exist_ok=True)
+    target = os.path.join(directory, os.path.basename(input_path))
+    if os.path.exists(target):
+        stem, extension = os.path.splitext(target)
+        target = f"{stem}_{datetime.now():%Y%m%d_%H%M%S}{extension}"
+    shutil.move(input_path, target)
+    return target
+
+def process_file(input_path):
+    """
+    Runs input validation, worktray creation, validation and submission for one input file.
+    The worktray, log and metrics of the run are written to its run directory; the input file is then
+    moved to inbox/processed or inbox/failed.
+    Returns True if all steps succeeded, otherwise False.
+    """
+    run_directory = run_directory_for(input_path)
+    os.makedirs(run_directory, exist_ok=True)
+    logging.info(f"Processing {input_path} in {run_directory}")
+
+    configure_queued_logging(os.path.join(run_directory, RUN_LOG_FILE))
+    reset_metrics()
+    success = False
+    try:
+        logging.info(f"-------STARTING THE PROCESS FOR {input_path}-------")
+        if not validate_input_file(input_path):
+            logging.error("Input validation failed. Process terminated.")
+        else:
+            storage = XlsxWorktrayStorage(os.path.join(run_directory, WORKTRAY_FILE), in_memory=True)
+            try:
+                success = (
+                    not create_worktray(storage=storage, input_path=input_path).empty
+                    and validate_worktray(storage=storage)
+                    and submit_to_google_forms(storage=storage, show_results=False)
+                )
+            finally:
+                storage.commit()
+                storage.close()
+            if success:
+                clear_submission_journal(storage.path)
+        logging.info(f"Process finished. Success: {success}")
+    except Exception as e:
+        logging.error(f"An unexpected error occurred: {str(e)}", exc_info=True)
+    finally:
+        export_metrics(directory=run_directory)
+        clear_input_cache()
+        configure_logging()
+
+    target = move_to(input_path, PROCESSED_DIRECTORY if success else FAILED_DIRECTORY)
+    logging.info(f"{'Processed' if success else 'Failed'} {input_path}; moved to {target}")
+    return success
+
+def watch(poll_interval=POLL_INTERVAL, once=False):
+    """
+    Processes the files that arrive in the inbox one at a time, until interrupted.
+    With `once`, processes the files currently in the inbox and returns.
+    Returns the number of files that failed.
+    """
+    os.makedirs(INBOX_DIRECTORY, exist_ok=True)
+    warm_up()
+    logging.info(f"Watching {INBOX_DIRECTORY} every {poll_interval}s")
+    failures = 0
+    try:
+        while True:
+            for input_path in pending_files():
+                if not process_file(input_path):
+                    failures += 1
+            if once:
+                break
+            time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        logging.info("Watch stopped by the user.")
+    return failures
+
+# Run the daemon if the script is run directly
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process every input workbook dropped into the inbox directory.")
+    parser.add_argument("--once", action="store_true", help="Process the files currently in the inbox and exit")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL, help="Seconds between scans of the inbox")
+    parser.add_argument("--profile", action="store_true", help=PROFILE_ARGUMENT_HELP)
+    args = parser.parse_args()
+    if args.profile:
+        set_profiling()
+
+    set_headless()  # Nobody is there to answer dialogs
+    configure_logging()
+    logging.info("---- Starting module 'watch_folder' ----")
+    failed_files = watch(args.poll_interval, args.once)
+    raise SystemExit(1 if failed_files else 0)
@@ -0,0 +1,94 @@
+import threading
+
+# Code of an empty "Observaciones" text
+NO_OBSERVATION = 0
+
+class ObservationCodes:
+    """
+    Interned "Observaciones" texts: each distinct text (e.g. "Faltan datos; Ingrese un monto válido")
+    is stored once, and work items keep its small integer code instead of their own copy.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.texts = [""]
+        self.codes = {"": NO_OBSERVATION}
+
+    def code(self, text):
+        """
+        Returns the code of `text`, registering it on first use.
+        """
+        code = self.codes.get(text)
+        if code is None:
+            with self.lock:
+                code = self.codes.get(text)
+                if code is None:
+                    code = len(self.texts)
+                    self.texts.append(text)
+                    self.codes[text] = code
+        return code
+
+    def text(self, code):
+        """
+        Returns the text of a code.
+        """
+        return self.texts[code]
+
+# Observation texts of the current process, shared by all modules
+observation_codes = ObservationCodes()
+
+class WorkItem:
+    """
+    One worktray row in flight: its data values, the "Datos correctos" and "Ingreso exitoso a Forms"
+    flags, the code of its "Observaciones" text and, once submitted in this run, the requests sent and
+    the seconds spent in backoff.
+    Slotted, so each row held by validation or submission costs a fixed small object plus its data tuple.
+    """
+    __slots__ = ("row", "data", "valid", "submitted", "observation", "attempts", "backoff_time")
+
+    def __init__(self, row, data, valid, submitted, observation=NO_OBSERVATION):
+        self.row = row
+        self.data = data
+        self.valid = valid
+        self.submitted = submitted
+        self.observation = observation
+        self.attempts = None  # Requests sent for the row in this run (None if it was not submitted)
+        self.backoff_time = None  # Seconds waited between those requests
+
+    @classmethod
+    def from_values(cls, worktray_row, values, plan):
+        """
+        Builds the work item of a worktray row from its cell values, laid out as in the form `plan`.
+        """
+        return cls(
+            worktray_row,
+            tuple(values[:plan.data_count]),
+            values[plan.valid_index],
+            values[plan.submitted_index],
+            observation_codes.code(values[plan.observations_index])
+        )
+
+    @property
+    def observation_text(self):
+        """
+        The "Observaciones" text of the row.
+        """
+        return observation_codes.text(self.observation)
+
+    def set_observation(self, text):
+        """
+        Sets the "Observaciones" text of the row.
+        """
+        self.observation = observation_codes.code(text)
+
+    def values(self):
+        """
+        Returns the cell values of the row: the data values followed by the three status columns.
+        """
+        return [*self.data, self.valid, self.submitted, self.observation_text]
+
+def work_items(rows, plan):
+    """
+    Converts `rows`, an iterable of (worktray row, values), into work items.
+    """
+    for worktray_row, values in rows:
+        yield WorkItem.from_values(worktray_row, values, plan)
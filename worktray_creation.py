@@ -1,8 +1,16 @@
-import shutil
 import pandas as pd
+import numpy as np
+import argparse
 import logging
 import os
-from openpyxl import load_workbook
+from input_loader import load_input_data
+from worktray_storage import open_worktray_storage
+from worktray_stream import load_template_layout
+from status_index import clear_status_index
+from run_metrics import timed_stage, add_stage_rows, export_metrics
+from queued_logging import configure_queued_logging
+from stage_profiling import PROFILE_ARGUMENT_HELP, set_profiling
+from form_plan import load_form_plan
 
 # Configurable parameters
 LOGS_DIRECTORY = "_logs"  # Directory to store logs
@@ -22,64 +30,83 @@ def configure_logging():
     if not os.path.exists(LOGS_DIRECTORY):
         os.makedirs(LOGS_DIRECTORY)
     
-    # Clear any existing logging configuration
-    logging.basicConfig(
-        filename=LOGS_FILE,
-        level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(message)s",
-        force=True  # Force reconfiguration of logging
-    )
+    # Clear any existing logging configuration; records are written to the file by a background thread
+    configure_queued_logging(LOGS_FILE)
     logging.info("Logging configured successfully.")
 
-# Required columns in the template
-REQUIRED_COLUMNS = [
-    "Nombre", "Producto", "Monto", "Fecha de Solicitud", 
-    "Datos correctos", "Ingreso exitoso a Forms", "Observaciones"
-]
+def build_worktray_rows(input_data, plan=None):
+    """
+    Builds the worktray rows from the input data in bulk: the data columns of the form `plan` followed by
+    "Datos correctos" and "Ingreso exitoso a Forms" set to "PENDING" and an empty "Observaciones".
+    The values are the ones a saved worktray reads back, so an in-memory worktray validates and posts the
+    same as one saved to disk: blank cells (NaN or NaT in the DataFrame) become None, and whole numbers of
+    columns that pandas read as float because of a blank cell become int again.
+    Returns a list of row lists.
+    """
+    plan = plan or load_form_plan()
+    data = input_data[plan.data_columns].astype(object)
+    rows = np.empty((len(input_data), plan.column_count), dtype=object)
+    rows[:, :plan.data_count] = data.where(data.notna(), None).to_numpy(dtype=object)
+    for index, column in enumerate(plan.data_columns):
+        if input_data[column].dtype.kind == "f":
+            rows[:, index] = [value if value is None or not value.is_integer() else int(value) for value in rows[:, index]]
+    rows[:, plan.valid_index] = "PENDING"
+    rows[:, plan.submitted_index] = "PENDING"
+    rows[:, plan.observations_index] = ""
+    return rows.tolist()
 
-def create_worktray():
+@timed_stage("create")
+def create_worktray(backend=None, storage=None, input_path=None, plan=None):
     """
-    Creates the worktray by copying the template and updating it with input data.
+    Creates the worktray from the template layout and the input data.
     Sets "Datos correctos" and "Ingreso exitoso a Forms" to "PENDING" by default.
+    The template layout is read once and all rows are written in a single pass to the worktray
+    storage (`backend`, worktray_storage.WORKTRAY_BACKEND by default). When an open `storage` is given
+    (fused pipeline), the rows are written to it and persisting them is left to the caller.
+    The input file is input/input_file.xlsx unless `input_path` is given.
+    The columns come from the form `plan` (the compiled input/form_schema.json by default).
     """
     try:
+        plan = plan or load_form_plan()
+
         # Paths to the template and input files
         template_path = os.path.join(INPUT_DIRECTORY, WORKTRAY_TEMPLATE_FILE)
-        input_file_path = os.path.join(INPUT_DIRECTORY, INPUT_FILE)
+        input_file_path = input_path or os.path.join(INPUT_DIRECTORY, INPUT_FILE)
         
         # Create the "process_data" directory if it doesn't exist
         if not os.path.exists(PROCESS_DATA_DIRECTORY):
             os.makedirs(PROCESS_DATA_DIRECTORY)
             logging.info(f"Created directory: {PROCESS_DATA_DIRECTORY}")
         
-        # Copy the template to the output file
-        output_path = os.path.join(PROCESS_DATA_DIRECTORY, WORKTRAY_OUTPUT_FILE)
-        shutil.copy(template_path, output_path)
-        logging.info(f"Template copied to: {output_path}")
-        
-        # Read the input file
-        input_data = pd.read_excel(input_file_path)
+        # Read the input file (parsed once per run and shared with the input validation)
+        input_data = load_input_data(input_file_path)
         
         # Validate required columns in the input file
-        input_columns = ["Nombre", "Producto", "Monto", "Fecha de Solicitud"]
-        if not all(column in input_data.columns for column in input_columns):
+        if not all(column in input_data.columns for column in plan.data_columns):
             logging.error("The input file is missing required columns.")
             return pd.DataFrame()
+
+        # The template must have the columns of the form schema, in the same order
+        template_columns = [header["value"] for header in load_template_layout(template_path)["header"]]
+        if template_columns[:plan.column_count] != plan.worktray_columns:
+            logging.error(f"The worktray template columns {template_columns} do not match the form schema {plan.worktray_columns}.")
+            return pd.DataFrame()
         
-        # Load the copied template
-        worktray_wb = load_workbook(output_path)
-        worktray_ws = worktray_wb.active
-        
-        # Append input data to the worktray
-        for index, row in input_data.iterrows():
-            worktray_ws.append([
-                row["Nombre"], row["Producto"], row["Monto"], row["Fecha de Solicitud"], 
-                "PENDING", "PENDING", ""
-            ])
-        
-        # Save the updated worktray
-        worktray_wb.save(output_path)
-        logging.info(f"Worktray successfully updated and saved to: {output_path}")
+        # Write all rows in a single pass; the xlsx backend starts from the template header, styles and column widths
+        add_stage_rows("create", len(input_data))
+        if storage is not None:
+            storage.write_rows(build_worktray_rows(input_data, plan))
+            clear_status_index(storage.path)
+            logging.info(f"Worktray successfully created in memory for: {storage.path}")
+            return input_data
+
+        storage = open_worktray_storage(backend, template_path, plan=plan)
+        try:
+            storage.write_rows(build_worktray_rows(input_data, plan))
+        finally:
+            storage.close()
+        clear_status_index(storage.path)
+        logging.info(f"Worktray successfully updated and saved to: {storage.path}")
         
         return input_data
     
@@ -89,6 +116,11 @@ def create_worktray():
 
 # Execute the function if the script is run directly
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create process_data/worktray.xlsx from the input file.")
+    parser.add_argument("--profile", action="store_true", help=PROFILE_ARGUMENT_HELP)
+    if parser.parse_args().profile:
+        set_profiling()
+
     # Configure logging
     if not os.path.exists("_logs"):
         os.makedirs("_logs")
@@ -96,6 +128,7 @@ if __name__ == "__main__":
     logging.info("---- Starting module 'worktray_creation' ----")
     # Create the worktray
     worktray = create_worktray()
+    export_metrics()
     
     if worktray.empty:
         logging.error("Worktray creation failed. Check the logs for details.")
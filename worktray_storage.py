@@ -0,0 +1,295 @@
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+from datetime import date, datetime, time, timedelta
+import pandas as pd
+from openpyxl import load_workbook
+from worktray_stream import worktray_column_count, load_template_layout, create_write_only_worktray, create_worktray_workbook, atomic_save
+
+# Configurable parameters
+WORKTRAY_BACKEND = "xlsx"  # Working store of the worktray: "xlsx" or "sqlite"
+PROCESS_DATA_DIRECTORY = "process_data"
+WORKTRAY_FILE = "worktray.xlsx"  # Worktray file (working store for "xlsx", exported report for other backends)
+WORKTRAY_DATABASE_FILE = "worktray.sqlite"  # Working store for the "sqlite" backend
+READ_CHUNK_SIZE = 10000  # Rows fetched per query by the SQLite backend
+LOOKUP_CHUNK_SIZE = 900  # Rows looked up by number per query by the SQLite backend (below SQLite's oldest limit of 999 parameters)
+
+def is_missing(value):
+    """
+    Tells whether a cell value is a pandas marker of a blank cell (NaN or NaT).
+    """
+    return value is pd.NaT or (isinstance(value, float) and value != value)
+
+def encode_value(value):
+    """
+    Encodes a cell value as JSON text, keeping the Python type (bool, datetime, ...) so the
+    validation rules see exactly what they would read from the Excel file. Blank cells
+    (None, NaN or NaT) are stored as null, as the Excel file would read them back.
+    """
+    if hasattr(value, "item") and not isinstance(value, (str, bytes)) and value is not pd.NaT:
+        value = value.item()  # NumPy scalars
+    if is_missing(value):
+        return json.dumps(None)
+    if isinstance(value, datetime):
+        return json.dumps({"$datetime": value.isoformat()})
+    if isinstance(value, date):
+        return json.dumps({"$date": value.isoformat()})
+    if isinstance(value, time):
+        return json.dumps({"$time": value.isoformat()})
+    if isinstance(value, timedelta):
+        return json.dumps({"$timedelta": value.total_seconds()})
+    return json.dumps(value, ensure_ascii=False)
+
+def decode_value(text):
+    """
+    Decodes a cell value encoded by encode_value.
+    """
+    if text is None:
+        return None
+    value = json.loads(text)
+    if isinstance(value, dict):
+        if "$datetime" in value:
+            return datetime.fromisoformat(value["$datetime"])
+        if "$date" in value:
+            return date.fromisoformat(value["$date"])
+        if "$time" in value:
+            return time.fromisoformat(value["$time"])
+        if "$timedelta" in value:
+            return timedelta(seconds=value["$timedelta"])
+    return value
+
+class XlsxWorktrayStorage:
+    """
+    Worktray stored directly in the Excel file, loaded fully in memory while it is used.
+    With `in_memory`, write_rows keeps the new worktray in memory and it is only written on commit.
+    Rows are read with the columns of `plan` (the form schema's unless given).
+    """
+    def __init__(self, path, template_path=None, in_memory=False, plan=None):
+        self.path = path
+        self.template_path = template_path
+        self.in_memory = in_memory
+        self.column_count = worktray_column_count(plan)
+        self.workbook = None
+        self.worksheet = None
+
+    def load(self):
+        """
+        Loads the workbook on first use.
+        """
+        if self.workbook is None:
+            logging.info(f"Reading the worktray from: {self.path}")
+            self.workbook = load_workbook(self.path)
+            self.worksheet = self.workbook.active
+        return self.worksheet
+
+    def write_rows(self, rows):
+        """
+        Creates the worktray from the template layout with the given rows.
+        """
+        if self.in_memory:
+            self.workbook, self.worksheet = create_worktray_workbook(load_template_layout(self.template_path))
+            for values in rows:
+                self.worksheet.append(values)
+            return
+        workbook, worksheet = create_write_only_worktray(load_template_layout(self.template_path))
+        for values in rows:
+            worksheet.append(values)
+        atomic_save(workbook, self.path)
+        self.workbook = None
+
+    def total_rows(self):
+        """
+        Returns the number of data rows.
+        """
+        return self.load().max_row - 1  # Subtract header row
+
+    def read_rows(self):
+        """
+        Yields (worktray row, values) for each data row, values being a list with one cell per worktray column.
+        """
+        worksheet = self.load()
+        for row in worksheet.iter_rows(min_row=2, max_row=worksheet.max_row, min_col=1, max_col=self.column_count):
+            yield row[0].row, [cell.value for cell in row]
+
+    def read_rows_at(self, worktray_rows):
+        """
+        Yields (worktray row, values) for the given data rows only, in the order given.
+        """
+        worksheet = self.load()
+        for worktray_row in worktray_rows:
+            yield worktray_row, [worksheet.cell(row=worktray_row, column=column).value for column in range(1, self.column_count + 1)]
+
+    def update_row(self, worktray_row, values, columns):
+        """
+        Writes the given column indices (zero-based) of a row.
+        """
+        worksheet = self.load()
+        for column in columns:
+            worksheet.cell(row=worktray_row, column=column + 1).value = values[column]
+
+    def commit(self):
+        """
+        Saves the worktray.
+        """
+        if self.workbook is not None:
+            atomic_save(self.workbook, self.path)
+
+    def export_xlsx(self, path):
+        """
+        Writes the worktray to `path` as an Excel report.
+        """
+        self.commit()
+        if os.path.abspath(path) != os.path.abspath(self.path):
+            shutil.copy(self.path, path)
+
+    def close(self):
+        """
+        Releases the loaded workbook without saving it.
+        """
+        self.workbook = None
+        self.worksheet = None
+
+class SqliteWorktrayStorage:
+    """
+    Worktray stored in a SQLite table with one row per worktray row and one column per worktray column.
+    Status updates only touch the rows that change; the Excel report is produced by export_xlsx.
+    Rows may be read from another thread than the one updating them (overlapped pipeline); queries are serialized by a lock.
+    """
+    def __init__(self, path, template_path=None, plan=None):
+        self.path = path
+        self.template_path = template_path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.column_count = worktray_column_count(plan)
+        columns = ", ".join(f"c{column} TEXT" for column in range(self.column_count))
+        self.connection.execute(f"CREATE TABLE IF NOT EXISTS worktray (row INTEGER PRIMARY KEY, {columns})")
+        self.connection.commit()
+
+    def write_rows(self, rows):
+        """
+        Replaces the content of the worktray with the given rows.
+        """
+        placeholders = ", ".join("?" * (self.column_count + 1))
+        with self.connection:
+            self.connection.execute("DELETE FROM worktray")
+            self.connection.executemany(
+                f"INSERT INTO worktray VALUES ({placeholders})",
+                (
+                    [worktray_row] + [encode_value(value) for value in values[:self.column_count]]
+                    for worktray_row, values in enumerate(rows, start=2)
+                )
+            )
+
+    def total_rows(self):
+        """
+        Returns the number of data rows.
+        """
+        return self.connection.execute("SELECT COUNT(*) FROM worktray").fetchone()[0]
+
+    def read_rows(self, chunk_size=READ_CHUNK_SIZE):
+        """
+        Yields (worktray row, values) for each data row in order, fetching `chunk_size` rows per query
+        so that rows can be updated while they are being read.
+        """
+        columns = ", ".join(f"c{column}" for column in range(self.column_count))
+        last_row = 0
+        while True:
+            with self.lock:
+                chunk = self.connection.execute(
+                    f"SELECT row, {columns} FROM worktray WHERE row > ? ORDER BY row LIMIT ?",
+                    (last_row, chunk_size)
+                ).fetchall()
+            if not chunk:
+                return
+            for record in chunk:
+                yield record[0], [decode_value(text) for text in record[1:]]
+            last_row = chunk[-1][0]
+
+    def read_rows_at(self, worktray_rows, chunk_size=LOOKUP_CHUNK_SIZE):
+        """
+        Yields (worktray row, values) for the given data rows only, in row order, fetching `chunk_size` rows per query.
+        """
+        columns = ", ".join(f"c{column}" for column in range(self.column_count))
+        worktray_rows = sorted(worktray_rows)
+        for start in range(0, len(worktray_rows), chunk_size):
+            chunk = worktray_rows[start:start + chunk_size]
+            placeholders = ", ".join("?" * len(chunk))
+            for record in self.connection.execute(
+                f"SELECT row, {columns} FROM worktray WHERE row IN ({placeholders}) ORDER BY row", chunk
+            ).fetchall():
+                yield record[0], [decode_value(text) for text in record[1:]]
+
+    def update_row(self, worktray_row, values, columns):
+        """
+        Writes the given column indices (zero-based) of a row.
+        """
+        assignments = ", ".join(f"c{column} = ?" for column in columns)
+        parameters = [encode_value(values[column]) for column in columns] + [worktray_row]
+        with self.lock:
+            self.connection.execute(f"UPDATE worktray SET {assignments} WHERE row = ?", parameters)
+
+    def commit(self):
+        """
+        Makes the pending updates durable.
+        """
+        with self.lock:
+            self.connection.commit()
+
+    def export_xlsx(self, path):
+        """
+        Writes the worktray to `path` as an Excel report built from the template layout.
+        """
+        self.commit()
+        workbook, worksheet = create_write_only_worktray(load_template_layout(self.template_path))
+        for _, values in self.read_rows():
+            worksheet.append(values)
+        atomic_save(workbook, path)
+
+    def close(self):
+        """
+        Commits and closes the database.
+        """
+        self.connection.commit()
+        self.connection.close()
+
+def open_worktray_storage(backend=None, template_path=None, in_memory=False, plan=None):
+    """
+    Opens the worktray with the configured backend (WORKTRAY_BACKEND unless `backend` is given).
+    `in_memory` keeps a newly created xlsx worktray in memory until it is committed.
+    `plan` gives the worktray columns; the form schema's plan is used unless it is given.
+    """
+    backend = backend or WORKTRAY_BACKEND
+    if backend == "xlsx":
+        return XlsxWorktrayStorage(os.path.join(PROCESS_DATA_DIRECTORY, WORKTRAY_FILE), template_path, in_memory, plan)
+    if backend == "sqlite":
+        return SqliteWorktrayStorage(os.path.join(PROCESS_DATA_DIRECTORY, WORKTRAY_DATABASE_FILE), template_path, plan)
+    raise ValueError(f"Unknown worktray backend: {backend}")
+
+def export_worktray(backend=None):
+    """
+    Exports the worktray of the configured backend to process_data/worktray.xlsx.
+    Returns True if the export succeeded, otherwise False.
+    """
+    try:
+        worktray_path = os.path.join(PROCESS_DATA_DIRECTORY, WORKTRAY_FILE)
+        storage = open_worktray_storage(backend)
+        try:
+            storage.export_xlsx(worktray_path)
+        finally:
+            storage.close()
+        logging.info(f"Worktray exported to: {worktray_path}")
+        return True
+    except Exception as e:
+        logging.error(f"Error exporting the worktray: {str(e)}", exc_info=True)
+        return False
+
+# Export the worktray if the script is run directly
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    export_worktray()
@@ -0,0 +1,176 @@
+import logging
+import os
+from copy import copy
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from form_plan import load_form_plan
+
+# Configurable parameters
+INPUT_DIRECTORY = "input"
+WORKTRAY_TEMPLATE_FILE = "worktray_template.xlsx"
+TEMPORARY_SUFFIX = ".tmp"  # Suffix of the file written before it is swapped in
+
+# Loaded template layouts, keyed by absolute path: {path: (mtime_ns, layout)}
+template_layout_cache = {}
+
+def worktray_column_count(plan=None):
+    """
+    Returns the number of worktray columns (data columns and status columns) of `plan`,
+    or of the form schema when no plan is given.
+    """
+    return (plan or load_form_plan()).column_count
+
+def load_template_layout(template_path=None):
+    """
+    Reads the sheet title, header row (values and styles), column widths and conditional
+    formatting of the worktray template.
+    The layout is cached, so the template is only parsed again when it changes on disk.
+    """
+    template_path = template_path or os.path.join(INPUT_DIRECTORY, WORKTRAY_TEMPLATE_FILE)
+    cache_key = os.path.abspath(template_path)
+    mtime = os.stat(template_path).st_mtime_ns
+    cached = template_layout_cache.get(cache_key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    template_wb = load_workbook(template_path)
+    template_ws = template_wb.active
+    header = []
+    for cell in template_ws[1]:
+        header.append({
+            "value": cell.value,
+            "font": copy(cell.font),
+            "fill": copy(cell.fill),
+            "border": copy(cell.border),
+            "alignment": copy(cell.alignment),
+            "number_format": cell.number_format,
+            "protection": copy(cell.protection),
+        })
+    layout = {
+        "title": template_ws.title,
+        "header": header,
+        "column_widths": {
+            letter: dimension.width
+            for letter, dimension in template_ws.column_dimensions.items()
+            if dimension.customWidth
+        },
+        "conditional_formatting": [
+            (str(conditional_format.sqref), list(conditional_format.rules))
+            for conditional_format in template_ws.conditional_formatting
+        ],
+    }
+    template_layout_cache[cache_key] = (mtime, layout)
+    logging.info(f"Worktray template layout loaded from: {template_path}")
+    return layout
+
+def create_write_only_worktray(layout):
+    """
+    Creates a write-only workbook with the template column widths, conditional formatting and styled header row.
+    Returns a tuple (workbook, worksheet) ready to receive data rows.
+    """
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(title=layout["title"])
+    for letter, width in layout["column_widths"].items():
+        worksheet.column_dimensions[letter].width = width
+    for cell_range, rules in layout["conditional_formatting"]:
+        for rule in rules:
+            worksheet.conditional_formatting.add(cell_range, copy(rule))
+
+    header_cells = []
+    for header in layout["header"]:
+        cell = WriteOnlyCell(worksheet, value=header["value"])
+        cell.font = header["font"]
+        cell.fill = header["fill"]
+        cell.border = header["border"]
+        cell.alignment = header["alignment"]
+        cell.number_format = header["number_format"]
+        cell.protection = header["protection"]
+        header_cells.append(cell)
+    worksheet.append(header_cells)
+    return workbook, worksheet
+
+def create_worktray_workbook(layout):
+    """
+    Creates an editable in-memory workbook with the template column widths, conditional formatting
+    and styled header row. Returns a tuple (workbook, worksheet) ready to receive data rows.
+    """
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = layout["title"]
+    for letter, width in layout["column_widths"].items():
+        worksheet.column_dimensions[letter].width = width
+    for cell_range, rules in layout["conditional_formatting"]:
+        for rule in rules:
+            worksheet.conditional_formatting.add(cell_range, copy(rule))
+
+    worksheet.append([header["value"] for header in layout["header"]])
+    for cell, header in zip(worksheet[1], layout["header"]):
+        cell.font = copy(header["font"])
+        cell.fill = copy(header["fill"])
+        cell.border = copy(header["border"])
+        cell.alignment = copy(header["alignment"])
+        cell.number_format = header["number_format"]
+        cell.protection = copy(header["protection"])
+    return workbook, worksheet
+
+def atomic_save(workbook, path):
+    """
+    Saves the workbook next to `path` and swaps it in atomically, so readers never see a partial file.
+    """
+    temporary_path = path + TEMPORARY_SUFFIX
+    try:
+        workbook.save(temporary_path)
+        os.replace(temporary_path, path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+class StreamingWorktray:
+    """
+    Reads a worktray row by row in read-only mode and writes the updated rows to a new
+    write-only workbook, which replaces the original file on commit. Memory use does not
+    grow with the number of rows. Rows are padded to the columns of `plan` (the form schema's unless given).
+    """
+    def __init__(self, path, template_path=None, plan=None):
+        self.path = path
+        self.column_count = worktray_column_count(plan)
+        self.source_wb = load_workbook(path, read_only=True)
+        self.source_ws = self.source_wb.active
+        self.target_wb, self.target_ws = create_write_only_worktray(load_template_layout(template_path))
+
+    def total_rows(self):
+        """
+        Returns the number of data rows according to the sheet dimensions.
+        """
+        return max(0, (self.source_ws.max_row or 1) - 1)
+
+    def rows(self):
+        """
+        Yields (worktray row, values) for each data row, where values is a mutable list
+        with at least one item per worktray column.
+        """
+        column_count = self.column_count
+        for worktray_row, values in enumerate(self.source_ws.iter_rows(min_row=2, values_only=True), start=2):
+            values = list(values)
+            if len(values) < column_count:
+                values.extend([None] * (column_count - len(values)))
+            yield worktray_row, values
+
+    def append(self, values):
+        """
+        Writes a row to the new worktray.
+        """
+        self.target_ws.append(values)
+
+    def commit(self):
+        """
+        Saves the new worktray and atomically replaces the original file with it.
+        """
+        self.source_wb.close()
+        atomic_save(self.target_wb, self.path)
+
+    def close(self):
+        """
+        Releases the source workbook without touching the original file.
+        """
+        self.source_wb.close()